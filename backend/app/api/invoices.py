@@ -1,15 +1,23 @@
 """Invoices API endpoints."""
 
 import os
+import re
+import shutil
+import hashlib
 import logging
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from datetime import datetime, date
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError
+from datetime import date
 import httpx
 
-from ..database import get_session
-from ..models import Invoice, Purchase, PurchaseItem
+from ..database import bulk_insert, get_session
+from ..http_cache import make_etag, not_modified_response
+from ..models import Invoice, Purchase, PurchaseItem, utc_now
 from ..document_parser import parse_document
 from ..gemini_invoice_parser import parse_invoice_with_gemini
 
@@ -18,14 +26,258 @@ router = APIRouter(prefix="/api/v1/invoices", tags=["invoices"])
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# XML parser service configuration
+XML_PARSER_URL = os.getenv("XML_PARSER_URL", "http://localhost:5000")
+XML_PARSER_TOKEN = os.getenv("XML_PARSER_TOKEN", "dev-token-12345")
+XML_PARSER_HEADERS = {'X-API-Token': XML_PARSER_TOKEN} if XML_PARSER_TOKEN else {}
+
+# Chunk size used when streaming uploaded files to disk (1 MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Plain ISO 8601 date (YYYY-MM-DD)
+_ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+
+# In-process LRU cache of XML parser results keyed by file content hash
+XML_PARSE_CACHE_SIZE = 128
+_xml_parse_cache: "OrderedDict[str, Dict]" = OrderedDict()
+
+
+def create_xml_parser_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client for the XML parser service.
+    
+    The client is created once at application startup so uploads reuse
+    pooled keep-alive connections instead of opening a new one each time.
+    """
+    # Security warning for default token
+    if XML_PARSER_TOKEN == "dev-token-12345":
+        logger.warning(
+            "Using default XML_PARSER_TOKEN='dev-token-12345'. "
+            "This is insecure for production! Set XML_PARSER_TOKEN environment variable."
+        )
+    
+    return httpx.AsyncClient(
+        base_url=XML_PARSER_URL,
+        timeout=30.0,
+        headers=XML_PARSER_HEADERS,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    )
+
+
+def parse_invoice_date(date_str: Optional[str]) -> date:
+    """Parse an invoice date, falling back to today if it is missing or invalid.
+    
+    Plain YYYY-MM-DD dates (the common case) are matched with a precompiled
+    regex; anything else goes through date.fromisoformat.
+    """
+    if not date_str:
+        return date.today()
+    
+    try:
+        match = _ISO_DATE.match(date_str)
+        if match:
+            return date(int(match[1]), int(match[2]), int(match[3]))
+        return date.fromisoformat(date_str)
+    except (ValueError, TypeError):
+        return date.today()
+
+
+async def hash_upload_file(file: UploadFile) -> str:
+    """Compute a content hash of an uploaded file and rewind it."""
+    digest = hashlib.blake2b(digest_size=16)
+    await file.seek(0)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+def get_cached_xml_parse(content_hash: str) -> Optional[Dict]:
+    """Return the cached parser result for an XML file, if any."""
+    parsed_data = _xml_parse_cache.get(content_hash)
+    if parsed_data is not None:
+        _xml_parse_cache.move_to_end(content_hash)
+    return parsed_data
+
+
+def cache_xml_parse(content_hash: str, parsed_data: Dict) -> None:
+    """Store a parser result, evicting the least recently used entry."""
+    _xml_parse_cache[content_hash] = parsed_data
+    _xml_parse_cache.move_to_end(content_hash)
+    if len(_xml_parse_cache) > XML_PARSE_CACHE_SIZE:
+        _xml_parse_cache.popitem(last=False)
+
+
+def _copy_to_path(source, file_path: str) -> None:
+    """Copy a binary file object to disk in bounded chunks."""
+    with open(file_path, 'wb') as f:
+        shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+
+
+async def save_upload_file(file: UploadFile, file_path: str) -> None:
+    """Write an uploaded file to disk without blocking the event loop."""
+    await file.seek(0)
+    await run_in_threadpool(_copy_to_path, file.file, file_path)
+
+
+async def parse_with_xml_service(client: httpx.AsyncClient, file: UploadFile) -> Dict:
+    """Send an uploaded XML invoice to the parser service and return its data."""
+    try:
+        await file.seek(0)
+        files = {'file': (file.filename, file.file, 'application/xml')}
+
+        response = await client.post("/parse", files=files)
+
+        if response.status_code == 401:
+            raise HTTPException(
+                status_code=502,
+                detail="XML parser authentication failed. Please check XML_PARSER_TOKEN configuration."
+            )
+        elif response.status_code != 200:
+            error_detail = "Failed to parse XML invoice"
+            try:
+                error_data = response.json()
+                if 'error' in error_data:
+                    error_detail = f"XML parser error: {error_data['error']}"
+            except Exception:
+                pass
+            raise HTTPException(
+                status_code=502,
+                detail=error_detail
+            )
+
+        return response.json()
+    except httpx.ConnectError:
+        raise HTTPException(
+            status_code=503,
+            detail=f"XML parser service is not available at {XML_PARSER_URL}. Please ensure the service is running."
+        )
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=504,
+            detail="XML parser service timed out. Please try again later."
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error parsing invoice: {str(e)}"
+        )
+
+
+def is_duplicate_invoice_number(error: IntegrityError) -> bool:
+    """Whether an IntegrityError comes from the unique invoice number.
+    
+    SQLite reports "UNIQUE constraint failed: invoice.invoice_number";
+    PostgreSQL names the unique index, ix_invoice_invoice_number.
+    """
+    message = str(error.orig).lower()
+    return "unique" in message and "invoice_number" in message
+
+
+def persist_invoice(
+    session: Session,
+    *,
+    invoice_number: str,
+    supplier: str,
+    invoice_date: date,
+    total_amount: float,
+    currency: str,
+    items_data: List[Dict],
+    file_path: str,
+    file_extension: str,
+    notes: str,
+    duplicate_detail: str,
+) -> Invoice:
+    """Create the purchase, its items and the invoice record in one transaction.
+    
+    This is blocking database work; async endpoints should call it through
+    run_in_threadpool.
+    
+    Raises:
+        HTTPException: If an invoice with the same number already exists
+    """
+    now = utc_now()
+    
+    # Create purchase from invoice
+    purchase = Purchase(
+        supplier=supplier,
+        purchase_date=invoice_date,
+        invoice_number=invoice_number,
+        total_amount=total_amount,
+        currency=currency,
+        notes=notes,
+        created_at=now
+    )
+    
+    session.add(purchase)
+    # Flush to get purchase.id; everything below is committed together
+    session.flush()
+    
+    # Create purchase items from parsed invoice items with executemany
+    # INSERTs instead of one ORM object per item
+    bulk_insert(session, PurchaseItem, [
+        {
+            'purchase_id': purchase.id,
+            'material_id': None,  # Will be matched manually later
+            'description': item_data.get('description', ''),
+            'sku': item_data.get('sku', ''),
+            'quantity': item_data.get('quantity', 0.0),
+            'unit_price': item_data.get('unit_price', 0.0),
+            'total_price': item_data.get('total_price', 0.0),
+        }
+        for item_data in items_data
+    ])
+    
+    # Create invoice record
+    invoice = Invoice(
+        invoice_number=invoice_number,
+        supplier=supplier,
+        invoice_date=invoice_date,
+        total_amount=total_amount,
+        currency=currency,
+        xml_file_path=file_path,
+        file_format=file_extension,
+        purchase_id=purchase.id,
+        created_at=now
+    )
+    
+    session.add(invoice)
+    
+    # Duplicate invoice numbers are rejected by the unique constraint
+    try:
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        if not is_duplicate_invoice_number(e):
+            raise
+        raise HTTPException(
+            status_code=400,
+            detail=duplicate_detail
+        )
+    session.refresh(invoice)
+    
+    return invoice
+
 
 @router.get("/", response_model=List[Invoice])
 def list_invoices(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     session: Session = Depends(get_session)
 ):
     """List all invoices."""
+    # Invoices are never edited, so the newest creation time and the row
+    # count identify the current state of the table
+    last_created, count = session.exec(
+        select(func.max(Invoice.created_at), func.count(Invoice.id))
+    ).one()
+    cached = not_modified_response(request, response, make_etag(last_created, count), last_created)
+    if cached:
+        return cached
+    
     query = select(Invoice).offset(skip).limit(limit).order_by(Invoice.created_at.desc())
     invoices = session.exec(query).all()
     return invoices
@@ -56,8 +308,17 @@ def delete_invoice(invoice_id: int, session: Session = Depends(get_session)):
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
+    # Uploads are stored by content hash, so keep the file if another
+    # invoice still references it
+    file_shared = session.exec(
+        select(Invoice.id)
+        .where(Invoice.xml_file_path == invoice.xml_file_path)
+        .where(Invoice.id != invoice.id)
+        .limit(1)
+    ).first() is not None
+    
     # Delete associated file if it exists
-    if invoice.xml_file_path and os.path.exists(invoice.xml_file_path):
+    if invoice.xml_file_path and not file_shared and os.path.exists(invoice.xml_file_path):
         try:
             os.remove(invoice.xml_file_path)
             logger.info(f"Deleted invoice file: {invoice.xml_file_path}")
@@ -68,15 +329,14 @@ def delete_invoice(invoice_id: int, session: Session = Depends(get_session)):
     if invoice.purchase_id:
         purchase = session.get(Purchase, invoice.purchase_id)
         if purchase:
-            # Delete all purchase items first
-            items_query = select(PurchaseItem).where(PurchaseItem.purchase_id == purchase.id)
-            items = session.exec(items_query).all()
-            for item in items:
-                session.delete(item)
+            # Delete all purchase items first with a single DELETE statement
+            result = session.exec(
+                delete(PurchaseItem).where(PurchaseItem.purchase_id == purchase.id)
+            )
             
             # Delete the purchase
             session.delete(purchase)
-            logger.info(f"Deleted purchase #{purchase.id} with {len(items)} items")
+            logger.info(f"Deleted purchase #{purchase.id} with {result.rowcount} items")
     
     # Delete the invoice
     session.delete(invoice)
@@ -90,12 +350,16 @@ def delete_invoice(invoice_id: int, session: Session = Depends(get_session)):
 
 @router.post("/upload")
 async def upload_invoice(
+    request: Request,
     file: UploadFile = File(...),
     session: Session = Depends(get_session)
 ):
     """Upload invoice file (XML, PDF, DOC, XLS, TXT), parse XML and create purchase."""
+    # Only the base name of the client-supplied filename is ever used
+    filename = os.path.basename(file.filename or '')
+    
     # Get file extension
-    file_extension = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
+    file_extension = filename.split('.')[-1].lower() if '.' in filename else ''
     
     # List of allowed extensions
     allowed_extensions = ['xml', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt']
@@ -106,19 +370,24 @@ async def upload_invoice(
             detail=f"File type not supported. Allowed formats: {', '.join(allowed_extensions)}"
         )
     
-    # Save uploaded file
+    # Save uploaded file under its content hash, so the stored path never
+    # depends on the client-supplied name
     upload_dir = "uploads"
     os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename)
-    
-    content = await file.read()
-    with open(file_path, 'wb') as f:
-        f.write(content)
+    content_hash = await hash_upload_file(file)
+    file_path = os.path.join(upload_dir, f"{content_hash}.{file_extension}")
 
     parser_provider = os.getenv("INVOICE_PARSER_PROVIDER", "legacy").strip().lower()
     gemini_api_key = os.getenv("GEMINI_API_KEY", "").strip()
     gemini_model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash").strip()
     
+    # XML files sent to the parser service are streamed straight from the
+    # upload and archived only after parsing succeeds; all other parsers
+    # read the file from disk.
+    use_xml_service = file_extension == 'xml' and parser_provider != "gemini"
+    if not use_xml_service:
+        await save_upload_file(file, file_path)
+    
     # Only parse XML files
     if file_extension == 'xml':
         if parser_provider == "gemini":
@@ -145,67 +414,15 @@ async def upload_invoice(
                     detail=f"Error parsing invoice with Gemini: {str(e)}"
                 )
         else:
-            # Read configuration from environment
-            xml_parser_url = os.getenv("XML_PARSER_URL", "http://localhost:5000")
-            xml_parser_token = os.getenv("XML_PARSER_TOKEN", "dev-token-12345")
+            # Parse XML using the shared parser service client, reusing
+            # the previous result when the same file is uploaded again
+            parsed_data = get_cached_xml_parse(content_hash)
+            if parsed_data is None:
+                parsed_data = await parse_with_xml_service(request.app.state.xml_client, file)
+                cache_xml_parse(content_hash, parsed_data)
             
-            # Security warning for default token
-            if xml_parser_token == "dev-token-12345":
-                logger.warning(
-                    "Using default XML_PARSER_TOKEN='dev-token-12345'. "
-                    "This is insecure for production! Set XML_PARSER_TOKEN environment variable."
-                )
-            
-            # Parse XML using parser service
-            try:
-                async with httpx.AsyncClient() as client:
-                    with open(file_path, 'rb') as f:
-                        files = {'file': (file.filename, f, 'application/xml')}
-                        headers = {'X-API-Token': xml_parser_token}
-                        
-                        response = await client.post(
-                            f"{xml_parser_url}/parse",
-                            files=files,
-                            headers=headers,
-                            timeout=30.0
-                        )
-                        
-                        if response.status_code == 401:
-                            raise HTTPException(
-                                status_code=502,
-                                detail="XML parser authentication failed. Please check XML_PARSER_TOKEN configuration."
-                            )
-                        elif response.status_code != 200:
-                            error_detail = "Failed to parse XML invoice"
-                            try:
-                                error_data = response.json()
-                                if 'error' in error_data:
-                                    error_detail = f"XML parser error: {error_data['error']}"
-                            except Exception:
-                                pass
-                            raise HTTPException(
-                                status_code=502,
-                                detail=error_detail
-                            )
-                        
-                        parsed_data = response.json()
-            except httpx.ConnectError:
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"XML parser service is not available at {xml_parser_url}. Please ensure the service is running."
-                )
-            except httpx.TimeoutException:
-                raise HTTPException(
-                    status_code=504,
-                    detail="XML parser service timed out. Please try again later."
-                )
-            except HTTPException:
-                raise
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error parsing invoice: {str(e)}"
-                )
+            # Archive the original XML now that the parser accepted it
+            await save_upload_file(file, file_path)
         
         # Extract invoice data from parsed XML
         invoice_number = parsed_data.get('invoice_number', '')
@@ -215,74 +432,29 @@ async def upload_invoice(
         currency = parsed_data.get('currency', 'RON')
         
         # Parse date
-        try:
-            invoice_date = date.fromisoformat(invoice_date_str)
-        except:
-            invoice_date = date.today()
-        
-        # Check if invoice already exists
-        existing = session.exec(
-            select(Invoice).where(Invoice.invoice_number == invoice_number)
-        ).first()
-        
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail="Invoice already uploaded"
-            )
-        
-        # Create purchase from invoice
-        purchase = Purchase(
-            supplier=supplier,
-            purchase_date=invoice_date,
-            invoice_number=invoice_number,
-            total_amount=total_amount,
-            currency=currency,
-            notes=f"Created from uploaded invoice {file.filename}",
-            created_at=datetime.utcnow()
-        )
+        invoice_date = parse_invoice_date(invoice_date_str)
         
-        session.add(purchase)
-        session.commit()
-        session.refresh(purchase)
-        
-        # Create purchase items from parsed invoice items
+        # Persist purchase, items and invoice without blocking the event loop
         items_data = parsed_data.get('items', [])
-        for item_data in items_data:
-            purchase_item = PurchaseItem(
-                purchase_id=purchase.id,
-                material_id=None,  # Will be matched manually later
-                description=item_data.get('description', ''),
-                sku=item_data.get('sku', ''),
-                quantity=item_data.get('quantity', 0.0),
-                unit_price=item_data.get('unit_price', 0.0),
-                total_price=item_data.get('total_price', 0.0)
-            )
-            session.add(purchase_item)
-        
-        session.commit()
-        
-        # Create invoice record
-        invoice = Invoice(
+        invoice = await run_in_threadpool(
+            persist_invoice,
+            session,
             invoice_number=invoice_number,
             supplier=supplier,
             invoice_date=invoice_date,
             total_amount=total_amount,
             currency=currency,
-            xml_file_path=file_path,
-            file_format=file_extension,
-            purchase_id=purchase.id,
-            created_at=datetime.utcnow()
+            items_data=items_data,
+            file_path=file_path,
+            file_extension=file_extension,
+            notes=f"Created from uploaded invoice {filename}",
+            duplicate_detail="Invoice already uploaded",
         )
         
-        session.add(invoice)
-        session.commit()
-        session.refresh(invoice)
-        
         return {
             "message": "Invoice uploaded and processed successfully",
             "invoice": invoice.model_dump(),
-            "purchase_id": purchase.id,
+            "purchase_id": invoice.purchase_id,
             "parsed_data": parsed_data
         }
     else:
@@ -301,7 +473,10 @@ async def upload_invoice(
                     model=gemini_model,
                 )
             else:
-                parsed_data = parse_document(file_path, file_extension)
+                # CPU-bound; keep it off the event loop
+                parsed_data = await run_in_threadpool(
+                    parse_document, file_path, file_extension, content_hash
+                )
         except httpx.HTTPStatusError as e:
             raise HTTPException(
                 status_code=502,
@@ -322,7 +497,7 @@ async def upload_invoice(
             }
         
         # Use filename as fallback for invoice number
-        invoice_number = parsed_data.get('invoice_number') or file.filename.rsplit('.', 1)[0]
+        invoice_number = parsed_data.get('invoice_number') or filename.rsplit('.', 1)[0]
         
         # Get other fields with fallbacks
         supplier = parsed_data.get('supplier_name') or 'Pending'
@@ -331,73 +506,25 @@ async def upload_invoice(
         currency = parsed_data.get('currency', 'RON')
         
         # Parse date
-        try:
-            if invoice_date_str:
-                invoice_date = date.fromisoformat(invoice_date_str)
-            else:
-                invoice_date = date.today()
-        except (ValueError, TypeError):
-            invoice_date = date.today()
-        
-        # Check if invoice already exists
-        existing = session.exec(
-            select(Invoice).where(Invoice.invoice_number == invoice_number)
-        ).first()
-        
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail="Invoice with this number already uploaded"
-            )
+        invoice_date = parse_invoice_date(invoice_date_str)
         
-        # Create purchase record
-        purchase = Purchase(
-            supplier=supplier,
-            purchase_date=invoice_date,
-            invoice_number=invoice_number,
-            total_amount=total_amount,
-            currency=currency,
-            notes=f"Created from uploaded invoice {file.filename} ({file_extension.upper()} format)",
-            created_at=datetime.utcnow()
-        )
-        
-        session.add(purchase)
-        session.commit()
-        session.refresh(purchase)
-        
-        # Create purchase items from parsed data
+        # Persist purchase, items and invoice without blocking the event loop
         items_data = parsed_data.get('items', [])
-        for item_data in items_data:
-            purchase_item = PurchaseItem(
-                purchase_id=purchase.id,
-                material_id=None,  # Will be matched manually later
-                description=item_data.get('description', ''),
-                sku=item_data.get('sku', ''),
-                quantity=item_data.get('quantity', 0.0),
-                unit_price=item_data.get('unit_price', 0.0),
-                total_price=item_data.get('total_price', 0.0)
-            )
-            session.add(purchase_item)
-        
-        session.commit()
-        
-        # Create invoice record
-        invoice = Invoice(
+        invoice = await run_in_threadpool(
+            persist_invoice,
+            session,
             invoice_number=invoice_number,
             supplier=supplier,
             invoice_date=invoice_date,
             total_amount=total_amount,
             currency=currency,
-            xml_file_path=file_path,
-            file_format=file_extension,
-            purchase_id=purchase.id,
-            created_at=datetime.utcnow()
+            items_data=items_data,
+            file_path=file_path,
+            file_extension=file_extension,
+            notes=f"Created from uploaded invoice {filename} ({file_extension.upper()} format)",
+            duplicate_detail="Invoice with this number already uploaded",
         )
         
-        session.add(invoice)
-        session.commit()
-        session.refresh(invoice)
-        
         # Determine message based on whether items were found
         if items_data:
             message = f"Invoice file ({file_extension.upper()}) uploaded and processed successfully. Found {len(items_data)} items."
@@ -407,7 +534,7 @@ async def upload_invoice(
         return {
             "message": message,
             "invoice": invoice.model_dump(),
-            "purchase_id": purchase.id,
+            "purchase_id": invoice.purchase_id,
             "parsed_data": parsed_data,
             "items_found": len(items_data)
         }
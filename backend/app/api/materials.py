@@ -1,18 +1,36 @@
 """Materials API endpoints."""
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
-from datetime import datetime
+from sqlalchemy import delete, func, literal_column, update
+from sqlalchemy.exc import IntegrityError
 
 from ..database import get_session
-from ..models import Material, Stock
+from ..http_cache import make_etag, not_modified_response
+from ..json_route import ORJSONRoute
+from ..material_cache import invalidate_material_cache
+from ..models import Material, Stock, utc_now
 
-router = APIRouter(prefix="/api/v1/materials", tags=["materials"])
+router = APIRouter(prefix="/api/v1/materials", tags=["materials"], route_class=ORJSONRoute)
+
+# Searchable text of a material; matches the trigram index expression
+# created in database.create_db_and_tables for PostgreSQL
+MATERIAL_SEARCH_TEXT = (
+    Material.name + literal_column("' '") + Material.sku + literal_column("' '")
+    + func.coalesce(Material.description, literal_column("''"))
+)
+
+# Fields that can be changed through update_material
+MATERIAL_UPDATE_FIELDS = {
+    "name", "sku", "description", "category", "unit", "unit_price", "min_stock"
+}
 
 
 @router.get("/", response_model=List[dict])
 def list_materials(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = Query(None),
@@ -20,30 +38,40 @@ def list_materials(
     session: Session = Depends(get_session)
 ):
     """List all materials with optional search and filters."""
-    query = select(Material)
+    # The list includes stock levels, so stock changes invalidate it too
+    last_updated, count, stock_updated = session.exec(
+        select(
+            func.max(Material.updated_at),
+            func.count(Material.id),
+            select(func.max(Stock.updated_at)).scalar_subquery(),
+        )
+    ).one()
+    last_modified = max(filter(None, (last_updated, stock_updated)), default=None)
+    cached = not_modified_response(
+        request, response, make_etag(last_updated, count, stock_updated), last_modified
+    )
+    if cached:
+        return cached
+    
+    # Fetch materials together with their stock level in a single query
+    query = select(Material, Stock.quantity).join(
+        Stock, Stock.material_id == Material.id, isouter=True
+    )
     
     if search:
-        query = query.where(
-            (Material.name.contains(search)) | 
-            (Material.sku.contains(search)) |
-            ((Material.description.is_not(None)) & (Material.description.contains(search)))
-        )
+        query = query.where(MATERIAL_SEARCH_TEXT.ilike(f"%{search}%"))
     
     if category:
         query = query.where(Material.category == category)
     
     query = query.offset(skip).limit(limit)
-    materials = session.exec(query).all()
+    rows = session.exec(query).all()
     
     # Enrich with stock information
     result = []
-    for material in materials:
-        stock = session.exec(
-            select(Stock).where(Stock.material_id == material.id)
-        ).first()
-        
+    for material, quantity in rows:
         material_dict = material.model_dump()
-        material_dict["current_stock"] = stock.quantity if stock else 0
+        material_dict["current_stock"] = quantity if quantity is not None else 0
         result.append(material_dict)
     
     return result
@@ -52,14 +80,15 @@ def list_materials(
 @router.get("/{material_id}", response_model=dict)
 def get_material(material_id: int, session: Session = Depends(get_session)):
     """Get material details with current stock."""
-    material = session.get(Material, material_id)
-    if not material:
-        raise HTTPException(status_code=404, detail="Material not found")
-    
-    stock = session.exec(
-        select(Stock).where(Stock.material_id == material_id)
+    row = session.exec(
+        select(Material, Stock)
+        .join(Stock, Stock.material_id == Material.id, isouter=True)
+        .where(Material.id == material_id)
     ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Material not found")
     
+    material, stock = row
     material_dict = material.model_dump()
     material_dict["current_stock"] = stock.quantity if stock else 0
     material_dict["stock_location"] = stock.location if stock else "Main Warehouse"
@@ -70,30 +99,29 @@ def get_material(material_id: int, session: Session = Depends(get_session)):
 @router.post("/", response_model=Material)
 def create_material(material: Material, session: Session = Depends(get_session)):
     """Create a new material."""
-    # Check if SKU already exists
-    existing = session.exec(
-        select(Material).where(Material.sku == material.sku)
-    ).first()
-    
-    if existing:
+    now = utc_now()
+    material.created_at = now
+    material.updated_at = now
+    
+    # SKU uniqueness is enforced by the database constraint
+    try:
+        session.add(material)
+        # Flush to get material.id so the stock entry is committed together
+        session.flush()
+        
+        # Create initial stock entry
+        stock = Stock(
+            material_id=material.id,
+            quantity=0.0,
+            location="Main Warehouse"
+        )
+        session.add(stock)
+        session.commit()
+    except IntegrityError:
+        session.rollback()
         raise HTTPException(status_code=400, detail="SKU already exists")
-    
-    material.created_at = datetime.utcnow()
-    material.updated_at = datetime.utcnow()
-    
-    session.add(material)
-    session.commit()
     session.refresh(material)
     
-    # Create initial stock entry
-    stock = Stock(
-        material_id=material.id,
-        quantity=0.0,
-        location="Main Warehouse"
-    )
-    session.add(stock)
-    session.commit()
-    
     return material
 
 
@@ -104,33 +132,24 @@ def update_material(
     session: Session = Depends(get_session)
 ):
     """Update an existing material."""
-    material = session.get(Material, material_id)
-    if not material:
-        raise HTTPException(status_code=404, detail="Material not found")
-    
-    # Check SKU uniqueness if changed
-    if material_update.sku != material.sku:
-        existing = session.exec(
-            select(Material).where(Material.sku == material_update.sku)
-        ).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="SKU already exists")
-    
-    # Update fields
-    material.name = material_update.name
-    material.sku = material_update.sku
-    material.description = material_update.description
-    material.category = material_update.category
-    material.unit = material_update.unit
-    material.unit_price = material_update.unit_price
-    material.min_stock = material_update.min_stock
-    material.updated_at = datetime.utcnow()
-    
-    session.add(material)
-    session.commit()
-    session.refresh(material)
+    # PUT replaces every editable field; ones left out get their defaults
+    values = material_update.model_dump(include=MATERIAL_UPDATE_FIELDS)
+    values["updated_at"] = utc_now()
+    
+    # SKU uniqueness is enforced by the database constraint
+    try:
+        result = session.exec(
+            update(Material).where(Material.id == material_id).values(**values)
+        )
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Material not found")
+        session.commit()
+        invalidate_material_cache()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=400, detail="SKU already exists")
     
-    return material
+    return session.get(Material, material_id)
 
 
 @router.delete("/{material_id}")
@@ -140,14 +159,11 @@ def delete_material(material_id: int, session: Session = Depends(get_session)):
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
     
-    # Delete associated stock
-    stock = session.exec(
-        select(Stock).where(Stock.material_id == material_id)
-    ).first()
-    if stock:
-        session.delete(stock)
+    # Delete associated stock with a single DELETE statement
+    session.exec(delete(Stock).where(Stock.material_id == material_id))
     
     session.delete(material)
     session.commit()
+    invalidate_material_cache()
     
     return {"message": "Material deleted successfully"}
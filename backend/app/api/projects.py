@@ -1,46 +1,65 @@
 """Projects API endpoints."""
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlmodel import Session, select
-from datetime import datetime, date, timezone
+from sqlalchemy import delete, exists, func, literal_column, update
+from datetime import datetime, timezone
+from tempfile import SpooledTemporaryFile
 
-from ..database import get_session
-from ..models import Project, ProjectMaterial, Material, StockMovement, ProjectMaterialUpdate, MaterialUsed, ProjectUpdate
-from ..pdf_service import generate_commercial_offer_pdf, remove_diacritics
+from ..database import bulk_insert, get_session
+from ..http_cache import make_etag, not_modified_response
+from ..json_route import ORJSONRoute
+from ..models import Project, ProjectMaterial, Material, StockMovement, ProjectMaterialUpdate, MaterialUsed, ProjectUpdate, utc_now
+from ..pdf_service import (
+    PDF_RENDER_WORKERS, PDF_SPOOL_MAX_SIZE, build_commercial_offer_pdf, cache_offer_pdf,
+    get_cached_offer_pdf, iter_file_chunks, offer_cache_key, render_offer_pdf_in_pool
+)
+from ..text_utils import remove_diacritics
 from ..word_service import generate_commercial_offer_word
 
-router = APIRouter(prefix="/api/v1/projects", tags=["projects"])
+router = APIRouter(prefix="/api/v1/projects", tags=["projects"], route_class=ORJSONRoute)
 
+# Searchable text of a project; matches the trigram index expression
+# created in database.create_db_and_tables for PostgreSQL
+PROJECT_SEARCH_TEXT = Project.name + literal_column("' '") + Project.client_name
 
-def parse_date_string(date_str: Optional[str], field_name: str) -> Optional[date]:
-    """Parse ISO date string to date object.
+
+def get_project_material_rows(session: Session, project_id: int) -> List[dict]:
+    """Fetch a project's materials with their names and SKUs in one query.
+    
+    Only the columns shown to clients and in offers are selected, so no
+    ProjectMaterial or Material objects are loaded.
     
     Args:
-        date_str: ISO 8601 date string (YYYY-MM-DD) or None
-        field_name: Name of the field for error messages
+        session: Database session
+        project_id: ID of the project
         
     Returns:
-        date object or None
-        
-    Raises:
-        HTTPException: If date format is invalid
+        List of material dicts for the project
     """
-    if not date_str:
-        return None
-    
-    try:
-        return datetime.fromisoformat(date_str).date()
-    except ValueError as e:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid date format for {field_name}. Expected ISO 8601 format (YYYY-MM-DD), got: {date_str}"
+    rows = session.exec(
+        select(
+            ProjectMaterial.id,
+            ProjectMaterial.material_id,
+            Material.name.label("material_name"),
+            Material.sku.label("material_sku"),
+            ProjectMaterial.quantity_planned,
+            ProjectMaterial.quantity_used,
+            ProjectMaterial.unit_price,
+            (ProjectMaterial.quantity_planned * ProjectMaterial.unit_price).label("total_cost"),
         )
+        .join(Material, Material.id == ProjectMaterial.material_id)
+        .where(ProjectMaterial.project_id == project_id)
+    ).mappings().all()
+    return [dict(row) for row in rows]
 
 
 @router.get("/", response_model=List[Project])
 def list_projects(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     status: Optional[str] = Query(None),
@@ -48,16 +67,20 @@ def list_projects(
     session: Session = Depends(get_session)
 ):
     """List all projects with filters."""
+    last_updated, count = session.exec(
+        select(func.max(Project.updated_at), func.count(Project.id))
+    ).one()
+    cached = not_modified_response(request, response, make_etag(last_updated, count), last_updated)
+    if cached:
+        return cached
+    
     query = select(Project)
     
     if status:
         query = query.where(Project.status == status)
     
     if search:
-        query = query.where(
-            (Project.name.contains(search)) | 
-            (Project.client_name.contains(search))
-        )
+        query = query.where(PROJECT_SEARCH_TEXT.ilike(f"%{search}%"))
     
     query = query.offset(skip).limit(limit)
     projects = session.exec(query).all()
@@ -73,24 +96,7 @@ def get_project(project_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Get project materials
-    project_materials = session.exec(
-        select(ProjectMaterial).where(ProjectMaterial.project_id == project_id)
-    ).all()
-    
-    materials_list = []
-    for pm in project_materials:
-        material = session.get(Material, pm.material_id)
-        if material:
-            materials_list.append({
-                "id": pm.id,
-                "material_id": material.id,
-                "material_name": material.name,
-                "material_sku": material.sku,
-                "quantity_planned": pm.quantity_planned,
-                "quantity_used": pm.quantity_used,
-                "unit_price": pm.unit_price,
-                "total_cost": pm.quantity_planned * pm.unit_price
-            })
+    materials_list = get_project_material_rows(session, project_id)
     
     project_dict = project.model_dump()
     project_dict["materials"] = materials_list
@@ -101,7 +107,9 @@ def get_project(project_id: int, session: Session = Depends(get_session)):
 @router.post("/", response_model=Project)
 def create_project(project_data: ProjectUpdate, session: Session = Depends(get_session)):
     """Create a new project."""
-    # Create project with date conversion
+    now = utc_now()
+    
+    # Create project; dates were parsed during validation
     project = Project(
         name=project_data.name,
         client_name=project_data.client_name,
@@ -109,8 +117,8 @@ def create_project(project_data: ProjectUpdate, session: Session = Depends(get_s
         location=project_data.location,
         capacity_kw=project_data.capacity_kw,
         status=project_data.status,
-        start_date=parse_date_string(project_data.start_date, "start_date"),
-        end_date=parse_date_string(project_data.end_date, "end_date"),
+        start_date=project_data.start_date,
+        end_date=project_data.end_date,
         estimated_cost=project_data.estimated_cost,
         actual_cost=project_data.actual_cost,
         labor_cost_estimated=project_data.labor_cost_estimated,
@@ -120,8 +128,8 @@ def create_project(project_data: ProjectUpdate, session: Session = Depends(get_s
         other_costs_estimated=project_data.other_costs_estimated,
         other_costs_actual=project_data.other_costs_actual,
         notes=project_data.notes,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        created_at=now,
+        updated_at=now
     )
     
     session.add(project)
@@ -138,35 +146,19 @@ def update_project(
     session: Session = Depends(get_session)
 ):
     """Update an existing project."""
-    project = session.get(Project, project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    # PUT replaces every field; ones left out get their defaults
+    values = project_update.model_dump()
+    values["updated_at"] = utc_now()
     
-    # Update fields
-    project.name = project_update.name
-    project.client_name = project_update.client_name
-    project.client_contact = project_update.client_contact
-    project.location = project_update.location
-    project.capacity_kw = project_update.capacity_kw
-    project.status = project_update.status
-    project.start_date = parse_date_string(project_update.start_date, "start_date")
-    project.end_date = parse_date_string(project_update.end_date, "end_date")
-    project.estimated_cost = project_update.estimated_cost
-    project.actual_cost = project_update.actual_cost
-    project.labor_cost_estimated = project_update.labor_cost_estimated
-    project.labor_cost_actual = project_update.labor_cost_actual
-    project.transport_cost_estimated = project_update.transport_cost_estimated
-    project.transport_cost_actual = project_update.transport_cost_actual
-    project.other_costs_estimated = project_update.other_costs_estimated
-    project.other_costs_actual = project_update.other_costs_actual
-    project.notes = project_update.notes
-    project.updated_at = datetime.utcnow()
+    result = session.exec(
+        update(Project).where(Project.id == project_id).values(**values)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
     
-    session.add(project)
     session.commit()
-    session.refresh(project)
     
-    return project
+    return session.get(Project, project_id)
 
 
 @router.delete("/{project_id}")
@@ -176,12 +168,8 @@ def delete_project(project_id: int, session: Session = Depends(get_session)):
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Delete associated materials
-    materials = session.exec(
-        select(ProjectMaterial).where(ProjectMaterial.project_id == project_id)
-    ).all()
-    for material in materials:
-        session.delete(material)
+    # Delete associated materials with a single DELETE statement
+    session.exec(delete(ProjectMaterial).where(ProjectMaterial.project_id == project_id))
     
     session.delete(project)
     session.commit()
@@ -196,14 +184,18 @@ def add_material_to_project(
     session: Session = Depends(get_session)
 ):
     """Add material to project."""
-    # Verify project exists
-    project = session.get(Project, project_id)
-    if not project:
+    # Verify project and material exist in a single round trip
+    project_exists, material_exists = session.exec(
+        select(
+            exists().where(Project.id == project_id),
+            exists().where(Material.id == project_material.material_id),
+        )
+    ).one()
+    
+    if not project_exists:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Verify material exists
-    material = session.get(Material, project_material.material_id)
-    if not material:
+    if not material_exists:
         raise HTTPException(status_code=404, detail="Material not found")
     
     project_material.project_id = project_id
@@ -281,33 +273,43 @@ def use_materials(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    for item in materials_used:
-        if item.quantity <= 0:
-            continue
-        
+    items = [item for item in materials_used if item.quantity > 0]
+    
+    # Fetch all affected project materials in one query
+    material_ids = {item.material_id for item in items}
+    project_materials = {}
+    if material_ids:
+        project_materials = {
+            pm.material_id: pm
+            for pm in session.exec(
+                select(ProjectMaterial).where(
+                    (ProjectMaterial.project_id == project_id) &
+                    (ProjectMaterial.material_id.in_(material_ids))
+                )
+            ).all()
+        }
+    
+    now = utc_now()
+    movements = []
+    for item in items:
         # Update project material
-        project_material = session.exec(
-            select(ProjectMaterial).where(
-                (ProjectMaterial.project_id == project_id) &
-                (ProjectMaterial.material_id == item.material_id)
-            )
-        ).first()
-        
+        project_material = project_materials.get(item.material_id)
         if project_material:
             project_material.quantity_used += item.quantity
             session.add(project_material)
         
         # Create stock movement
-        movement = StockMovement(
-            material_id=item.material_id,
-            movement_type="out",
-            quantity=item.quantity,
-            reference_type="project",
-            reference_id=project_id,
-            notes=f"Used in project: {project.name}"
-        )
-        session.add(movement)
-    
+        movements.append({
+            "material_id": item.material_id,
+            "movement_type": "out",
+            "quantity": item.quantity,
+            "reference_type": "project",
+            "reference_id": project_id,
+            "notes": f"Used in project: {project.name}",
+            "created_at": now,
+        })
+    
+    bulk_insert(session, StockMovement, movements)
     session.commit()
     
     return {"message": "Materials marked as used successfully"}
@@ -320,45 +322,44 @@ def export_project_pdf(project_id: int, session: Session = Depends(get_session))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Refresh project to ensure we have the latest data from database
-    session.refresh(project)
-    
     # Get project materials
-    project_materials = session.exec(
-        select(ProjectMaterial).where(ProjectMaterial.project_id == project_id)
-    ).all()
-    
-    materials_list = []
-    for pm in project_materials:
-        material = session.get(Material, pm.material_id)
-        if material:
-            materials_list.append({
-                "material_id": material.id,
-                "material_name": material.name,
-                "material_sku": material.sku,
-                "quantity_planned": pm.quantity_planned,
-                "quantity_used": pm.quantity_used,
-                "unit_price": pm.unit_price,
-                "total_cost": pm.quantity_planned * pm.unit_price
-            })
+    materials_list = get_project_material_rows(session, project_id)
     
     # Prepare project data for PDF
     project_data = project.model_dump()
     
     # Generate PDF
     try:
-        pdf_bytes = generate_commercial_offer_pdf(project_data, materials_list)
-        
         # Create filename
         filename = f"Oferta_Comerciala_{remove_diacritics(project.name.replace(' ', '_'))}_{datetime.now().strftime('%Y%m%d')}.pdf"
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
         
-        # Return PDF as response
-        return Response(
-            content=pdf_bytes,
+        # Identical offers rendered earlier today are served from memory
+        cache_key = offer_cache_key(project_data, materials_list)
+        pdf = get_cached_offer_pdf(cache_key)
+        if pdf is not None:
+            return Response(content=pdf, media_type="application/pdf", headers=headers)
+        
+        # With worker processes configured, render off the GIL of this process
+        if PDF_RENDER_WORKERS:
+            pdf = render_offer_pdf_in_pool(project_data, materials_list)
+            cache_offer_pdf(cache_key, pdf)
+            return Response(content=pdf, media_type="application/pdf", headers=headers)
+        
+        buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+        build_commercial_offer_pdf(buffer, project_data, materials_list)
+        
+        # Small PDFs are still in memory; keep a copy for repeat downloads
+        if buffer.tell() <= PDF_SPOOL_MAX_SIZE:
+            buffer.seek(0)
+            cache_offer_pdf(cache_key, buffer.read())
+        buffer.seek(0)
+        
+        # Stream PDF from the spooled buffer instead of copying it into a bytes object
+        return StreamingResponse(
+            iter_file_chunks(buffer),
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
-            }
+            headers=headers
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
@@ -371,27 +372,8 @@ def export_project_word(project_id: int, session: Session = Depends(get_session)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Refresh project to ensure we have the latest data from database
-    session.refresh(project)
-    
     # Get project materials
-    project_materials = session.exec(
-        select(ProjectMaterial).where(ProjectMaterial.project_id == project_id)
-    ).all()
-    
-    materials_list = []
-    for pm in project_materials:
-        material = session.get(Material, pm.material_id)
-        if material:
-            materials_list.append({
-                "material_id": material.id,
-                "material_name": material.name,
-                "material_sku": material.sku,
-                "quantity_planned": pm.quantity_planned,
-                "quantity_used": pm.quantity_used,
-                "unit_price": pm.unit_price,
-                "total_cost": pm.quantity_planned * pm.unit_price
-            })
+    materials_list = get_project_material_rows(session, project_id)
     
     # Prepare project data for Word document
     project_data = project.model_dump()
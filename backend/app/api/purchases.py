@@ -3,13 +3,19 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
-from datetime import datetime
+from sqlalchemy import lambda_stmt
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 
-from ..database import get_session
-from ..models import Purchase, PurchaseItem, StockMovement, Material, PurchaseCreate, PurchaseItemUpdate, Stock
+from ..database import bulk_insert, get_session
+from ..json_route import ORJSONRoute
+from ..material_cache import get_material_cached
+from ..models import (
+    Purchase, PurchaseItem, StockMovement, Material, PurchaseCreate, PurchaseItemUpdate, Stock,
+    PurchaseListItem, PurchaseWithItems, utc_now
+)
 
-router = APIRouter(prefix="/api/v1/purchases", tags=["purchases"])
+router = APIRouter(prefix="/api/v1/purchases", tags=["purchases"], route_class=ORJSONRoute)
 
 
 class CreateMaterialRequest(BaseModel):
@@ -55,8 +61,7 @@ def add_purchase_item_to_stock(
         raise HTTPException(status_code=404, detail="Purchase item not found")
     
     # Verify material exists
-    material = session.get(Material, request.material_id)
-    if not material:
+    if not get_material_cached(session, request.material_id):
         raise HTTPException(status_code=404, detail="Material not found")
     
     # Update purchase item with material_id
@@ -71,13 +76,11 @@ def add_purchase_item_to_stock(
         unit_price=purchase_item.unit_price,  # Track acquisition price
         reference_type="purchase",
         reference_id=purchase_id,
-        notes=f"Added from purchase {purchase.invoice_number or purchase_id}",
-        created_at=datetime.utcnow()
+        notes=f"Added from purchase {purchase.invoice_number or purchase_id}"
     )
     session.add(movement)
     
     session.commit()
-    session.refresh(purchase_item)
     
     return AddItemToStockResponse(
         message="Item added to stock successfully",
@@ -105,12 +108,7 @@ def create_material_from_purchase_item(
     if not purchase_item or purchase_item.purchase_id != purchase_id:
         raise HTTPException(status_code=404, detail="Purchase item not found")
     
-    # Check if SKU already exists
-    existing = session.exec(
-        select(Material).where(Material.sku == request.sku)
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="SKU already exists")
+    now = utc_now()
     
     # Create new material
     material = Material(
@@ -121,19 +119,25 @@ def create_material_from_purchase_item(
         unit=request.unit,
         unit_price=request.unit_price,
         min_stock=request.min_stock,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        created_at=now,
+        updated_at=now
     )
-    session.add(material)
-    session.commit()
-    session.refresh(material)
+    
+    # SKU uniqueness is enforced by the database constraint. Flushing
+    # assigns material.id; everything below commits in one transaction.
+    try:
+        session.add(material)
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=400, detail="SKU already exists")
     
     # Create initial stock entry with the purchase item quantity
     stock = Stock(
         material_id=material.id,
         quantity=purchase_item.quantity,
         location="Main Warehouse",
-        updated_at=datetime.utcnow()
+        updated_at=now
     )
     session.add(stock)
     
@@ -150,12 +154,11 @@ def create_material_from_purchase_item(
         reference_type="purchase",
         reference_id=purchase_id,
         notes=f"Created material from purchase {purchase.invoice_number or purchase_id}",
-        created_at=datetime.utcnow()
+        created_at=now
     )
     session.add(movement)
     
     session.commit()
-    session.refresh(purchase_item)
     
     return AddItemToStockResponse(
         message="Material created and item added to stock successfully",
@@ -197,48 +200,47 @@ def update_purchase_item(
     
     session.add(purchase_item)
     session.commit()
-    session.refresh(purchase_item)
     
     return purchase_item
 
 
-@router.get("/", response_model=List[Purchase])
+@router.get("/", response_model=List[PurchaseListItem])
 def list_purchases(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     session: Session = Depends(get_session)
 ):
     """List all purchases."""
-    query = select(Purchase).offset(skip).limit(limit).order_by(Purchase.created_at.desc())
-    purchases = session.exec(query).all()
-    return purchases
+    # lambda_stmt caches the constructed statement, so repeat calls only
+    # bind new skip/limit values
+    query = lambda_stmt(lambda: select(
+        Purchase.id,
+        Purchase.supplier,
+        Purchase.purchase_date,
+        Purchase.invoice_number,
+        Purchase.total_amount,
+        Purchase.currency,
+        Purchase.created_at,
+    ).order_by(Purchase.created_at.desc()))
+    query += lambda s: s.offset(skip).limit(limit)
+    return session.execute(query).mappings().all()
 
 
-@router.get("/{purchase_id}", response_model=dict)
+@router.get("/{purchase_id}", response_model=PurchaseWithItems)
 def get_purchase(purchase_id: int, session: Session = Depends(get_session)):
     """Get purchase details with items."""
     purchase = session.get(Purchase, purchase_id)
     if not purchase:
         raise HTTPException(status_code=404, detail="Purchase not found")
     
-    # Get purchase items
+    # Get purchase items with the names of their matched materials
     items = session.exec(
-        select(PurchaseItem).where(PurchaseItem.purchase_id == purchase_id)
-    ).all()
-    
-    items_list = []
-    for item in items:
-        item_dict = item.model_dump()
-        if item.material_id:
-            material = session.get(Material, item.material_id)
-            if material:
-                item_dict["material_name"] = material.name
-        items_list.append(item_dict)
+        select(*PurchaseItem.__table__.c, Material.name.label("material_name"))
+        .join(Material, PurchaseItem.material_id == Material.id, isouter=True)
+        .where(PurchaseItem.purchase_id == purchase_id)
+    ).mappings().all()
     
-    purchase_dict = purchase.model_dump()
-    purchase_dict["items"] = items_list
-    
-    return purchase_dict
+    return PurchaseWithItems(**purchase.model_dump(), items=items)
 
 
 @router.post("/", response_model=Purchase)
@@ -247,6 +249,8 @@ def create_purchase(
     session: Session = Depends(get_session)
 ):
     """Create purchase and automatically update stock."""
+    now = utc_now()
+    
     # Create purchase
     purchase = Purchase(
         supplier=purchase_data.supplier,
@@ -255,41 +259,35 @@ def create_purchase(
         total_amount=purchase_data.total_amount,
         currency=purchase_data.currency,
         notes=purchase_data.notes,
-        created_at=datetime.utcnow()
+        created_at=now
     )
     
     session.add(purchase)
-    session.commit()
-    session.refresh(purchase)
+    session.flush()  # Assigns purchase.id without committing
+    
+    # Create purchase items with executemany INSERTs
+    bulk_insert(session, PurchaseItem, [
+        {"purchase_id": purchase.id, **item_data.model_dump()}
+        for item_data in purchase_data.items
+    ])
     
-    # Create purchase items and stock movements
-    for item_data in purchase_data.items:
-        item = PurchaseItem(
-            purchase_id=purchase.id,
-            material_id=item_data.material_id,
-            description=item_data.description,
-            sku=item_data.sku,
-            quantity=item_data.quantity,
-            unit_price=item_data.unit_price,
-            total_price=item_data.total_price
-        )
-        session.add(item)
-        
-        # Create stock movement if material is matched
-        if item.material_id:
-            movement = StockMovement(
-                material_id=item.material_id,
-                movement_type="in",
-                quantity=item.quantity,
-                unit_price=item.unit_price,  # Track acquisition price
-                reference_type="purchase",
-                reference_id=purchase.id,
-                notes=f"Purchase from {purchase.supplier}",
-                created_at=datetime.utcnow()
-            )
-            session.add(movement)
+    # Create stock movements for matched materials
+    bulk_insert(session, StockMovement, [
+        {
+            "material_id": item.material_id,
+            "movement_type": "in",
+            "quantity": item.quantity,
+            "unit_price": item.unit_price,  # Track acquisition price
+            "reference_type": "purchase",
+            "reference_id": purchase.id,
+            "notes": f"Purchase from {purchase.supplier}",
+            "created_at": now,
+        }
+        for item in purchase_data.items
+        if item.material_id
+    ])
     
+    # Purchase, items and movements are written in one transaction
     session.commit()
-    session.refresh(purchase)
     
     return purchase
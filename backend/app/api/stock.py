@@ -1,87 +1,123 @@
 """Stock API endpoints."""
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
-from datetime import datetime
+from sqlalchemy import func, lambda_stmt, update
 
 from ..database import get_session
-from ..models import Stock, StockMovement, Material
+from ..models import (
+    Stock, StockMovement, Material, StockListItem, LowStockItem, MovementWithMaterial, utc_now
+)
 from ..gsheets_journal import append_journal_row
+from ..http_cache import make_etag, not_modified_response
+from ..json_route import ORJSONRoute
+from ..material_cache import get_material_cached
 
-router = APIRouter(prefix="/api/v1/stock", tags=["stock"])
+router = APIRouter(prefix="/api/v1/stock", tags=["stock"], route_class=ORJSONRoute)
 
 
-@router.get("/", response_model=List[dict])
+# Stock columns plus the material fields shown next to them. Selecting
+# plain columns lets rows be returned as mappings straight to the
+# response model, without ORM hydration or intermediate dicts.
+STOCK_ROW_COLUMNS = (
+    *Stock.__table__.c,
+    Material.name.label("material_name"),
+    Material.sku.label("material_sku"),
+    Material.category.label("material_category"),
+    Material.min_stock,
+)
+
+
+def acquisition_price_column():
+    """Latest priced "in" movement for the stock row, else the catalog price.
+    
+    Correlated against Stock so it can be selected next to each stock row
+    instead of issuing one query per row.
+    """
+    latest_price = (
+        select(StockMovement.unit_price)
+        .where(StockMovement.material_id == Stock.material_id)
+        .where(StockMovement.movement_type == "in")
+        .where(StockMovement.unit_price.is_not(None))
+        .order_by(StockMovement.created_at.desc())
+        .limit(1)
+        .correlate(Stock)
+        .scalar_subquery()
+    )
+    return func.coalesce(latest_price, Material.unit_price).label("acquisition_price")
+
+
+def stock_list_validators(session: Session):
+    """ETag and Last-Modified shared by the stock list endpoints.
+    
+    The lists combine stock rows, material fields and the latest priced
+    movement, so a change to any of the three yields a new ETag.
+    """
+    stock_updated, stock_count, material_updated, last_movement_id = session.exec(
+        select(
+            func.max(Stock.updated_at),
+            func.count(Stock.id),
+            select(func.max(Material.updated_at)).scalar_subquery(),
+            select(func.max(StockMovement.id)).scalar_subquery(),
+        )
+    ).one()
+    etag = make_etag(stock_updated, stock_count, material_updated, last_movement_id)
+    last_modified = max(filter(None, (stock_updated, material_updated)), default=None)
+    return etag, last_modified
+
+
+@router.get("/", response_model=List[StockListItem])
 def list_stock(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     session: Session = Depends(get_session)
 ):
     """List all stock with material information."""
-    query = select(Stock).offset(skip).limit(limit)
-    stocks = session.exec(query).all()
-    
-    result = []
-    for stock in stocks:
-        material = session.get(Material, stock.material_id)
-        if material:
-            stock_dict = stock.model_dump()
-            stock_dict["material_name"] = material.name
-            stock_dict["material_sku"] = material.sku
-            stock_dict["material_category"] = material.category
-            stock_dict["min_stock"] = material.min_stock
-            stock_dict["is_low"] = stock.quantity < material.min_stock
-            
-            # Get the latest acquisition price from stock movements
-            latest_movement = session.exec(
-                select(StockMovement)
-                .where(StockMovement.material_id == stock.material_id)
-                .where(StockMovement.movement_type == "in")
-                .where(StockMovement.unit_price is not None)
-                .order_by(StockMovement.created_at.desc())
-            ).first()
-            
-            stock_dict["acquisition_price"] = latest_movement.unit_price if latest_movement else material.unit_price
-            
-            result.append(stock_dict)
-    
-    return result
-
-
-@router.get("/low", response_model=List[dict])
-def get_low_stock(session: Session = Depends(get_session)):
+    cached = not_modified_response(request, response, *stock_list_validators(session))
+    if cached:
+        return cached
+    
+    query = (
+        select(
+            *STOCK_ROW_COLUMNS,
+            acquisition_price_column(),
+            (Stock.quantity < Material.min_stock).label("is_low"),
+        )
+        .join(Material, Stock.material_id == Material.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return session.exec(query).mappings().all()
+
+
+@router.get("/low", response_model=List[LowStockItem])
+def get_low_stock(
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_session)
+):
     """Get items with stock below minimum threshold."""
-    stocks = session.exec(select(Stock)).all()
-    
-    result = []
-    for stock in stocks:
-        material = session.get(Material, stock.material_id)
-        if material and stock.quantity < material.min_stock:
-            stock_dict = stock.model_dump()
-            stock_dict["material_name"] = material.name
-            stock_dict["material_sku"] = material.sku
-            stock_dict["material_category"] = material.category
-            stock_dict["min_stock"] = material.min_stock
-            stock_dict["shortage"] = material.min_stock - stock.quantity
-            
-            # Get the latest acquisition price from stock movements
-            latest_movement = session.exec(
-                select(StockMovement)
-                .where(StockMovement.material_id == stock.material_id)
-                .where(StockMovement.movement_type == "in")
-                .where(StockMovement.unit_price is not None)
-                .order_by(StockMovement.created_at.desc())
-            ).first()
-            
-            stock_dict["acquisition_price"] = latest_movement.unit_price if latest_movement else material.unit_price
-            
-            result.append(stock_dict)
-    
-    return result
-
-
-@router.get("/movements/", response_model=List[dict])
+    cached = not_modified_response(request, response, *stock_list_validators(session))
+    if cached:
+        return cached
+    
+    # Let the database return only the rows below their minimum
+    query = (
+        select(
+            *STOCK_ROW_COLUMNS,
+            acquisition_price_column(),
+            (Material.min_stock - Stock.quantity).label("shortage"),
+        )
+        .join(Material, Stock.material_id == Material.id)
+        .where(Stock.quantity < Material.min_stock)
+    )
+    return session.exec(query).mappings().all()
+
+
+@router.get("/movements/", response_model=List[MovementWithMaterial])
 def list_movements(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
@@ -90,40 +126,37 @@ def list_movements(
     session: Session = Depends(get_session)
 ):
     """List stock movements with filters."""
-    query = select(StockMovement)
+    # Built as a lambda statement so the constructed query is cached per
+    # filter combination and only the parameters change between calls
+    query = lambda_stmt(lambda: select(
+        *StockMovement.__table__.c,
+        Material.name.label("material_name"),
+        Material.sku.label("material_sku"),
+    ).join(Material, StockMovement.material_id == Material.id, isouter=True))
     
     if material_id:
-        query = query.where(StockMovement.material_id == material_id)
+        query += lambda s: s.where(StockMovement.material_id == material_id)
     
     if movement_type:
-        query = query.where(StockMovement.movement_type == movement_type)
-    
-    query = query.order_by(StockMovement.created_at.desc()).offset(skip).limit(limit)
-    movements = session.exec(query).all()
+        query += lambda s: s.where(StockMovement.movement_type == movement_type)
     
-    result = []
-    for movement in movements:
-        material = session.get(Material, movement.material_id)
-        movement_dict = movement.model_dump()
-        if material:
-            movement_dict["material_name"] = material.name
-            movement_dict["material_sku"] = material.sku
-        result.append(movement_dict)
-    
-    return result
+    query += lambda s: s.order_by(StockMovement.created_at.desc()).offset(skip).limit(limit)
+    return session.execute(query).mappings().all()
 
 
 @router.get("/{material_id}", response_model=dict)
 def get_stock(material_id: int, session: Session = Depends(get_session)):
     """Get stock for specific material."""
-    stock = session.exec(
-        select(Stock).where(Stock.material_id == material_id)
+    row = session.exec(
+        select(Stock, Material)
+        .join(Material, Stock.material_id == Material.id, isouter=True)
+        .where(Stock.material_id == material_id)
     ).first()
     
-    if not stock:
+    if not row:
         raise HTTPException(status_code=404, detail="Stock not found")
     
-    material = session.get(Material, material_id)
+    stock, material = row
     stock_dict = stock.model_dump()
     
     if material:
@@ -138,47 +171,66 @@ def get_stock(material_id: int, session: Session = Depends(get_session)):
 def create_movement(movement: StockMovement, session: Session = Depends(get_session)):
     """Record stock movement and update stock levels."""
     # Verify material exists
-    material = session.get(Material, movement.material_id)
+    material = get_material_cached(session, movement.material_id)
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
     
-    # Get or create stock entry
-    stock = session.exec(
-        select(Stock).where(Stock.material_id == movement.material_id)
-    ).first()
-    
-    if not stock:
-        stock = Stock(
-            material_id=movement.material_id,
-            quantity=0.0,
-            location="Main Warehouse"
-        )
-        session.add(stock)
+    now = utc_now()
+    quantity = movement.quantity
     
-    # Update stock based on movement type
-    if movement.movement_type == "in":
-        stock.quantity += movement.quantity
+    # Update stock with a single conditional UPDATE so concurrent
+    # movements cannot both act on the same stale quantity
+    if movement.movement_type in ("in", "transfer"):
+        # For transfers, we just adjust the quantity
+        new_quantity = Stock.quantity + quantity
     elif movement.movement_type == "out":
-        if stock.quantity < movement.quantity:
+        new_quantity = Stock.quantity - quantity
+    elif movement.movement_type == "adjustment":
+        new_quantity = quantity
+    else:
+        new_quantity = Stock.quantity
+    
+    # stock.material_id is not unique, so only the material's first stock
+    # row is changed, the one the movement endpoint has always updated
+    first_stock_id = (
+        select(Stock.id)
+        .where(Stock.material_id == movement.material_id)
+        .order_by(Stock.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    stock_update = (
+        update(Stock)
+        .where(Stock.id == first_stock_id)
+        .values(quantity=new_quantity, updated_at=now)
+    )
+    if movement.movement_type == "out":
+        stock_update = stock_update.where(Stock.quantity >= quantity)
+    
+    result = session.exec(stock_update)
+    
+    if result.rowcount == 0:
+        if movement.movement_type == "out":
+            session.rollback()
             raise HTTPException(
                 status_code=400,
                 detail="Insufficient stock"
             )
-        stock.quantity -= movement.quantity
-    elif movement.movement_type == "adjustment":
-        stock.quantity = movement.quantity
-    elif movement.movement_type == "transfer":
-        # For transfers, we just adjust the quantity
-        stock.quantity += movement.quantity
-    
-    stock.updated_at = datetime.utcnow()
+        # No stock entry yet; start it from zero
+        initial_quantity = 0.0
+        if movement.movement_type in ("in", "transfer", "adjustment"):
+            initial_quantity = quantity
+        session.add(Stock(
+            material_id=movement.material_id,
+            quantity=initial_quantity,
+            location="Main Warehouse",
+            updated_at=now
+        ))
     
     # Create movement record
-    movement.created_at = datetime.utcnow()
+    movement.created_at = now
     session.add(movement)
-    session.add(stock)
     session.commit()
-    session.refresh(movement)
 
     # Best-effort: also append the live row to Google Sheets journal.
     # Failures should not block the main operation.
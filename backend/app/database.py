@@ -1,10 +1,11 @@
 """Database connection and initialization."""
 
 import os
+import hashlib
 from pathlib import Path
 from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
+from sqlalchemy import event, insert
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 
 # Get database URL from environment or use default SQLite
@@ -27,21 +28,33 @@ if "sqlite:///" in DATABASE_URL:
 # Optimize SQLite settings for Raspberry Pi and SD card performance
 sqlite_connect_args = {"check_same_thread": False}
 
+# Connection pool sizing. The defaults (5 + 10 overflow) are smaller than
+# FastAPI's threadpool, so concurrent requests would queue on checkout.
+# A file-backed SQLite database still gets a QueuePool: one shared
+# StaticPool connection is not safe across the threadpool's workers.
+DB_POOL_SIZE = int(os.getenv("SOLARAPP_DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("SOLARAPP_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("SOLARAPP_DB_POOL_TIMEOUT", "30"))
+
 # Create engine with optimizations
 engine = create_engine(
     DATABASE_URL,
     echo=False,  # Set to True for SQL logging
     connect_args=sqlite_connect_args if "sqlite" in DATABASE_URL else {},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,  # Seconds to wait for a free connection
     pool_pre_ping=True,  # Check connection health
     pool_recycle=3600,  # Recycle connections every hour
 )
 
 
-# Set SQLite-specific pragmas for Raspberry Pi optimization
-@event.listens_for(Engine, "connect")
+# Set SQLite-specific pragmas for Raspberry Pi optimization.
+# "connect" fires once per new DBAPI connection, not on every checkout.
+@event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_conn, connection_record):
     """Set SQLite pragmas for better performance on Raspberry Pi."""
-    if "sqlite" in DATABASE_URL:
+    if engine.dialect.name == "sqlite":
         cursor = dbapi_conn.cursor()
         # Use Write-Ahead Logging for better concurrency and less SD card wear
         cursor.execute("PRAGMA journal_mode=WAL")
@@ -51,15 +64,102 @@ def set_sqlite_pragma(dbapi_conn, connection_record):
         cursor.execute("PRAGMA cache_size=-32000")
         # Keep temp tables in memory
         cursor.execute("PRAGMA temp_store=MEMORY")
+        # Memory-map up to 256MB of the file to save read syscalls
+        cursor.execute("PRAGMA mmap_size=268435456")
+        # Wait up to 5s for a competing writer instead of "database is locked"
+        cursor.execute("PRAGMA busy_timeout=5000")
         cursor.close()
 
 
-def create_db_and_tables():
-    """Create all database tables."""
+# Trigram indexes backing the substring search on materials and projects.
+# The expressions must match the search expressions used by the API.
+# PostgreSQL only; SQLite scans these tables, which stay small.
+POSTGRES_SEARCH_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_material_search_trgm ON material USING gin "
+    "((name || ' ' || sku || ' ' || coalesce(description, '')) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_project_search_trgm ON project USING gin "
+    "((name || ' ' || client_name) gin_trgm_ops)",
+]
+
+
+def schema_fingerprint() -> int:
+    """Fingerprint of the tables and indexes defined by the models.
+    
+    Stored in SQLite's user_version, so startup can tell that an existing
+    database already has the current schema. user_version is a signed
+    32-bit integer and 0 means it was never set.
+    """
+    ddl = []
+    for table in SQLModel.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+        ddl.extend(sorted(
+            str(CreateIndex(index).compile(dialect=engine.dialect))
+            for index in table.indexes
+        ))
+    digest = hashlib.blake2b(";".join(ddl).encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big", signed=True) or 1
+
+
+def create_db_and_tables() -> bool:
+    """Create all database tables.
+    
+    A SQLite database stamped with the current schema fingerprint is left
+    alone, skipping the per-table and per-index existence checks.
+    Returns whether the schema was (re)applied.
+    """
+    # Register every table model on the metadata, whoever the caller is
+    from . import models  # noqa: F401
+    
+    if engine.dialect.name == "sqlite":
+        fingerprint = schema_fingerprint()
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA user_version").scalar() == fingerprint:
+                return False
+    
     SQLModel.metadata.create_all(engine)
+    
+    # create_all only indexes tables it creates; add indexes introduced
+    # since an existing database was set up
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            # Refresh planner statistics, e.g. for newly created indexes
+            conn.exec_driver_sql("PRAGMA optimize")
+            conn.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
+    
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for statement in POSTGRES_SEARCH_INDEXES:
+                conn.exec_driver_sql(statement)
+    
+    return True
+
+
+# Rows per executemany INSERT in bulk_insert
+BULK_INSERT_BATCH_SIZE = 500
+
+
+def bulk_insert(session: Session, model, rows):
+    """Insert many rows of a table model with batched executemany INSERTs.
+    
+    Rows are plain dicts of column values; columns left out get their
+    server defaults. Nothing is committed, so the rows join the caller's
+    transaction, and no ORM objects are created for them.
+    """
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        session.execute(insert(model), rows[start:start + BULK_INSERT_BATCH_SIZE])
 
 
 def get_session():
-    """Get database session for dependency injection."""
-    with Session(engine) as session:
+    """Get database session for dependency injection.
+    
+    Endpoints stay synchronous: the SQLite driver blocks, so FastAPI runs
+    them in its threadpool rather than on the event loop. Objects are not
+    expired on commit, so returning them afterwards needs no extra SELECT.
+    """
+    with Session(engine, expire_on_commit=False) as session:
         yield session
@@ -1,8 +1,12 @@
 """Document parser service for extracting invoice materials from PDF, DOC, and TXT files."""
 
+import os
 import re
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 from io import BytesIO
 
 # Import PDF and DOC parsing libraries
@@ -12,6 +16,12 @@ try:
 except ImportError:
     PDF_AVAILABLE = False
 
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
 try:
     from docx import Document
     DOCX_AVAILABLE = True
@@ -20,19 +30,107 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# In-process LRU cache of parse results keyed by (content hash, extension)
+PARSE_CACHE_SIZE = 256
+PARSE_HASH_CHUNK_SIZE = 1 << 20
+_parse_cache: "OrderedDict[Tuple[str, str], CachedParse]" = OrderedDict()
+# Uploads are parsed on the threadpool, so cache access is serialized
+_parse_cache_lock = threading.Lock()
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text content from PDF file."""
+# PDF text backend: "auto" uses PDFium (native code) when pypdfium2 is
+# installed and PyPDF2 otherwise; "pdfium" or "pypdf2" force one of them
+PDF_BACKEND = os.getenv("SOLARAPP_PDF_BACKEND", "auto").strip().lower()
+
+# PyPDF2 seeks around the xref tables with many small reads; a buffer
+# sized for typical invoices (100KB-2MB) saves most of the syscalls
+PDF_READ_BUFFER_SIZE = 256 * 1024
+
+
+# Patterns are compiled once at import; the parsers run them per line
+_INVOICE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'(?:invoice|factura|nr\.?\s*factura)[:\s#]*([A-Z0-9\-/]+)',
+    r'(?:invoice\s*(?:no|number|nr)[:\s#]*([A-Z0-9\-/]+))',
+    r'nr\.?\s*(\d+[A-Z0-9\-/]*)',
+))
+_DATE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'(?:date|data)[:\s]*(\d{1,2}[\./-]\d{1,2}[\./-]\d{2,4})',
+    r'(\d{1,2}[\./-]\d{1,2}[\./-]\d{2,4})',
+    r'(\d{4}-\d{2}-\d{2})',
+))
+_SUPPLIER_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'(?:supplier|furnizor|seller)[:\s]+(.+)',
+    r'(?:s\.?c\.?)\s+([A-Z][A-Za-z\s&\.]+(?:s\.?r\.?l\.?|s\.?a\.?))',
+))
+# ASCII case folding matches str.lower() for these keywords
+_TOTAL_KEYWORD_RE = re.compile(r'total|suma', re.IGNORECASE | re.ASCII)
+_AMOUNT_RE = re.compile(r'(\d{1,3}(?:[,\.\s]\d{3})*[,\.]\d{2}|\d+[,\.]\d{2}|\d+)')
+_NUMBERS_RE = re.compile(r'\d+(?:[,\.]\d+)?')
+_DIGIT_RE = re.compile(r'\d')
+_ASCII_DIGITS_DELETE = str.maketrans('', '', '0123456789')
+_NORMALIZE_DATE_PATTERNS = (
+    (re.compile(r'(\d{1,2})[\./-](\d{1,2})[\./-](\d{4})'),
+     lambda m: f"{m.group(3)}-{m.group(2).zfill(2)}-{m.group(1).zfill(2)}"),
+    (re.compile(r'(\d{4})-(\d{2})-(\d{2})'),
+     lambda m: f"{m.group(1)}-{m.group(2)}-{m.group(3)}"),
+)
+
+
+def iter_pdf_page_texts(file_path: str) -> Iterator[str]:
+    """Yield the text of each PDF page as it is extracted.
+    
+    Pages are decoded lazily, so a consumer that stops early never pays
+    for the remaining pages.
+    """
+    if _use_pdfium():
+        yield from _iter_pdfium_page_texts(file_path)
+        return
+    
     if not PDF_AVAILABLE:
         raise Exception("PyPDF2 library not available. Install with: pip install PyPDF2")
     
+    with open(file_path, 'rb', buffering=PDF_READ_BUFFER_SIZE) as file:
+        reader = PdfReader(file)
+        for page in reader.pages:
+            yield page.extract_text()
+
+
+def _use_pdfium() -> bool:
+    """Whether PDF text should be extracted with PDFium."""
+    if PDF_BACKEND == "pypdf2":
+        return False
+    if PDF_BACKEND == "pdfium" and not PDFIUM_AVAILABLE:
+        raise Exception("pypdfium2 library not available. Install with: pip install pypdfium2")
+    return PDFIUM_AVAILABLE
+
+
+def _iter_pdfium_page_texts(file_path: str) -> Iterator[str]:
+    """Yield page texts extracted by PDFium, releasing native handles."""
+    pdf = pdfium.PdfDocument(file_path)
     try:
-        text = ""
-        with open(file_path, 'rb') as file:
-            reader = PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+        for page in pdf:
+            textpage = page.get_textpage()
+            try:
+                # PDFium ends lines with CRLF; the parser splits on LF
+                yield textpage.get_text_range().replace('\r\n', '\n')
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text content from PDF file.
+    
+    All pages are needed: the invoice total and line items often sit on
+    the last pages, so parsing cannot stop after the header fields.
+    """
+    if not (PDF_AVAILABLE or PDFIUM_AVAILABLE):
+        raise Exception("PyPDF2 library not available. Install with: pip install PyPDF2")
+    
+    try:
+        # Join once instead of growing a string page by page
+        return "".join([text + "\n" for text in iter_pdf_page_texts(file_path)])
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
         raise Exception(f"Failed to extract text from PDF: {str(e)}")
@@ -45,14 +143,23 @@ def extract_text_from_docx(file_path: str) -> str:
     
     try:
         doc = Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        parts = [paragraph.text for paragraph in doc.paragraphs]
         
-        # Also extract text from tables
+        # Also extract text from tables. Merged cells are repeated once
+        # per grid column and row they span, so each underlying <w:tc>
+        # element's text is rendered once per table and then reused.
         for table in doc.tables:
+            cell_texts: Dict[object, str] = {}
             for row in table.rows:
-                text += "\n" + "\t".join([cell.text for cell in row.cells])
+                row_texts = []
+                for cell in row.cells:
+                    text = cell_texts.get(cell._tc)
+                    if text is None:
+                        text = cell_texts[cell._tc] = cell.text
+                    row_texts.append(text)
+                parts.append("\t".join(row_texts))
         
-        return text
+        return "\n".join(parts)
     except Exception as e:
         logger.error(f"Error extracting text from DOCX: {e}")
         raise Exception(f"Failed to extract text from DOCX: {str(e)}")
@@ -69,18 +176,65 @@ def extract_text_from_doc(file_path: str) -> str:
 
 
 def extract_text_from_txt(file_path: str) -> str:
-    """Extract text content from TXT file."""
+    """Extract text content from TXT file.
+    
+    The file is read once; non-UTF-8 content is decoded as Latin-1 from
+    the same bytes instead of reopening the file.
+    """
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+        text = data.decode('utf-8')
     except UnicodeDecodeError:
-        # Try with different encoding
-        try:
-            with open(file_path, 'r', encoding='latin-1') as file:
-                return file.read()
-        except Exception as e:
-            logger.error(f"Error reading TXT file: {e}")
-            raise Exception(f"Failed to read TXT file: {str(e)}")
+        # Latin-1 maps every byte, so this cannot fail
+        text = data.decode('latin-1')
+    
+    # Same newline handling as reading in text mode
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _first_line_match(patterns, text: str, pos: int = 0, endpos: Optional[int] = None):
+    """Find the match a line-by-line scan over ``patterns`` would return.
+    
+    That is the match on the earliest line where any pattern matches,
+    preferring the earlier pattern when several match on the same line.
+    Each pattern is searched over the whole text in C; a hit is confirmed
+    against its own line, since ``\\s`` may match across line breaks.
+    
+    Args:
+        patterns: Compiled patterns in priority order
+        text: Full document text
+        pos: Offset of the first line to consider
+        endpos: Only consider lines ending before this offset
+        
+    Returns:
+        The winning match object, or None
+    """
+    if endpos is None:
+        endpos = len(text)
+    
+    best = None
+    for pattern in patterns:
+        start = pos
+        while True:
+            match = pattern.search(text, start, endpos)
+            if not match:
+                break
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            line_end = text.find('\n', match.start(), endpos)
+            if line_end < 0:
+                line_end = endpos
+            line_match = pattern.search(text, line_start, line_end)
+            if line_match:
+                best = line_match
+                # Later patterns only win on an earlier line
+                endpos = max(line_start - 1, pos)
+                break
+            start = line_end + 1
+        if endpos <= pos:
+            break
+    return best
 
 
 def parse_invoice_materials(text: str) -> Dict:
@@ -105,64 +259,55 @@ def parse_invoice_materials(text: str) -> Dict:
         'items': []
     }
     
-    lines = text.split('\n')
+    # Header fields: each pattern scans the whole text once instead of
+    # being tried on every line
+    match = _first_line_match(_INVOICE_PATTERNS, text)
+    if match:
+        result['invoice_number'] = match.group(1).strip()
     
-    # Pattern matching for common invoice fields
-    for i, line in enumerate(lines):
-        line_lower = line.lower().strip()
-        
-        # Extract invoice number
-        if not result['invoice_number']:
-            invoice_patterns = [
-                r'(?:invoice|factura|nr\.?\s*factura)[:\s#]*([A-Z0-9\-/]+)',
-                r'(?:invoice\s*(?:no|number|nr)[:\s#]*([A-Z0-9\-/]+))',
-                r'nr\.?\s*(\d+[A-Z0-9\-/]*)',
-            ]
-            for pattern in invoice_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    result['invoice_number'] = match.group(1).strip()
-                    break
-        
-        # Extract invoice date
-        if not result['invoice_date']:
-            date_patterns = [
-                r'(?:date|data)[:\s]*(\d{1,2}[\./-]\d{1,2}[\./-]\d{2,4})',
-                r'(\d{1,2}[\./-]\d{1,2}[\./-]\d{2,4})',
-                r'(\d{4}-\d{2}-\d{2})',
-            ]
-            for pattern in date_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    date_str = match.group(1).strip()
-                    # Convert date format if needed
-                    result['invoice_date'] = normalize_date(date_str)
-                    break
-        
-        # Extract supplier name (usually near the top)
-        if not result['supplier_name'] and i < 10:
-            supplier_patterns = [
-                r'(?:supplier|furnizor|seller)[:\s]+(.+)',
-                r'(?:s\.?c\.?)\s+([A-Z][A-Za-z\s&\.]+(?:s\.?r\.?l\.?|s\.?a\.?))',
-            ]
-            for pattern in supplier_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    result['supplier_name'] = match.group(1).strip()
-                    break
-        
-        # Extract total amount
-        if 'total' in line_lower or 'suma' in line_lower:
-            amount_pattern = r'(\d{1,3}(?:[,\.\s]\d{3})*[,\.]\d{2}|\d+[,\.]\d{2}|\d+)'
-            match = re.search(amount_pattern, line)
-            if match:
-                amount_str = match.group(1).replace(',', '.').replace(' ', '')
-                try:
-                    amount = float(amount_str)
-                    if amount > result['total_amount']:
-                        result['total_amount'] = amount
-                except ValueError:
-                    pass
+    match = _first_line_match(_DATE_PATTERNS, text)
+    if match:
+        # Convert date format if needed
+        result['invoice_date'] = normalize_date(match.group(1).strip())
+    
+    # Supplier name is usually near the top, within the first 10 lines
+    top_end = -1
+    for _ in range(10):
+        top_end = text.find('\n', top_end + 1)
+        if top_end < 0:
+            top_end = len(text)
+            break
+    pos = 0
+    while True:
+        match = _first_line_match(_SUPPLIER_PATTERNS, text, pos, top_end)
+        if not match:
+            break
+        result['supplier_name'] = match.group(1).strip()
+        if result['supplier_name']:
+            break
+        # Blank name on this line; keep looking on the following ones
+        pos = text.find('\n', match.end())
+        if pos < 0:
+            break
+        pos += 1
+    
+    # Extract total amount: jump straight to lines mentioning a total
+    pos = 0
+    while keyword := _TOTAL_KEYWORD_RE.search(text, pos):
+        line_start = text.rfind('\n', 0, keyword.start()) + 1
+        line_end = text.find('\n', keyword.end())
+        if line_end < 0:
+            line_end = len(text)
+        match = _AMOUNT_RE.search(text, line_start, line_end)
+        if match:
+            amount_str = match.group(1).replace(',', '.').replace(' ', '')
+            try:
+                amount = float(amount_str)
+                if amount > result['total_amount']:
+                    result['total_amount'] = amount
+            except ValueError:
+                pass
+        pos = line_end + 1
     
     # Extract line items
     # Look for table-like structures with materials
@@ -181,11 +326,25 @@ def extract_line_items(text: str) -> List[Dict]:
     """
     items = []
     lines = text.split('\n')
+    # Lowercase the whole text once; lowercasing never adds or removes
+    # newlines, so lines_lower[i] is always lines[i].lower()
+    lines_lower = text.lower().split('\n')
+    
+    # Repeated lines (page headers, footers, duplicated rows) are parsed
+    # once per document; hits get a fresh copy of the item dict
+    parsed_lines: Dict[str, Optional[Dict]] = {}
+    
+    def parse_cached(line: str, line_lower: str) -> Optional[Dict]:
+        if line in parsed_lines:
+            item = parsed_lines[line]
+            return dict(item) if item else None
+        item = parse_line_item(line, line_lower)
+        parsed_lines[line] = dict(item) if item else None
+        return item
     
     # Try to identify table headers
     header_idx = -1
-    for i, line in enumerate(lines):
-        line_lower = line.lower()
+    for i, line_lower in enumerate(lines_lower):
         # Look for common table headers
         if any(keyword in line_lower for keyword in ['descriere', 'description', 'produs', 'material', 'item']):
             if any(keyword in line_lower for keyword in ['cantitate', 'quantity', 'qty', 'cant']):
@@ -200,32 +359,50 @@ def extract_line_items(text: str) -> List[Dict]:
                 continue
             
             # Try to extract item information using patterns
-            item = parse_line_item(line)
+            item = parse_cached(line, lines_lower[i])
             if item:
                 items.append(item)
     
     # If no items found via table parsing, try a more aggressive approach
     if not items:
-        for line in lines:
-            item = parse_line_item(line)
+        for line, line_lower in zip(lines, lines_lower):
+            item = parse_cached(line, line_lower)
             if item and item['quantity'] > 0 and item['unit_price'] > 0:
                 items.append(item)
     
     return items
 
 
-def parse_line_item(line: str) -> Optional[Dict]:
+def _count_digits(line: str) -> int:
+    """Count the digits in a line, matching what the \\d pattern sees."""
+    if line.isascii():
+        # str.translate runs in C, with no regex or match objects
+        return len(line) - len(line.translate(_ASCII_DIGITS_DELETE))
+    return len(_DIGIT_RE.findall(line))
+
+
+def parse_line_item(line: str, line_lower: Optional[str] = None) -> Optional[Dict]:
     """Parse a single line item from invoice text.
     
     Expects patterns like:
     - "Product name    10    100.00    1000.00"
     - "Product name | 10 | 100.00 | 1000.00"
     - "Product name, 10 buc, 100.00 RON, 1000.00 RON"
+    
+    ``line_lower`` may be passed when the caller already has the line in
+    lowercase; only keyword checks use it, so surrounding whitespace does
+    not matter.
     """
+    # A line item needs at least two numbers, so lines with fewer than
+    # two digits are rejected before any keyword or regex scan
+    digit_count = _count_digits(line)
+    if digit_count < 2:
+        return None
+    
     # Skip lines that are likely headers or totals
     # Only skip if these keywords appear without other content (likely a header row)
-    line_lower = line.lower().strip()
-    line_words = line_lower.split()
+    if line_lower is None:
+        line_lower = line.lower()
     
     # Check if line is primarily a header (contains header keywords and few other words)
     header_keywords = ['total', 'subtotal', 'tva', 'tax', 'discount']
@@ -237,37 +414,17 @@ def parse_line_item(line: str) -> Optional[Dict]:
     
     # Skip if it appears to be a table header (has multiple header keywords and no numbers)
     header_count = sum(1 for kw in table_header_keywords if kw in line_lower)
-    if header_count >= 2 and len(re.findall(r'\d', line)) < 3:
+    if header_count >= 2 and digit_count < 3:
         return None
     
     # Extract numbers from the line
-    numbers = re.findall(r'\d+(?:[,\.]\d+)?', line)
+    numbers = _NUMBERS_RE.findall(line)
     if len(numbers) < 2:
         return None
     
-    # Convert to floats
-    try:
-        numeric_values = [float(n.replace(',', '.')) for n in numbers]
-    except ValueError:
-        return None
-    
-    # Heuristic: If we have 3 or more numbers, the pattern is likely: quantity, unit_price, total_price
-    # If we have exactly 2 numbers, assume quantity and price (calculate total)
-    if len(numeric_values) >= 3:
-        # Take the last 3 numbers as quantity, unit_price, total_price
-        quantity = numeric_values[-3]
-        unit_price = numeric_values[-2]
-        total_price = numeric_values[-1]
-    elif len(numeric_values) == 2:
-        quantity = numeric_values[0]
-        unit_price = numeric_values[1]
-        total_price = quantity * unit_price
-    else:
-        return None
-    
     # Extract description (text before numbers start)
     # Find position of first number
-    first_num_match = re.search(r'\d', line)
+    first_num_match = _DIGIT_RE.search(line)
     if first_num_match:
         description = line[:first_num_match.start()].strip()
     else:
@@ -277,6 +434,19 @@ def parse_line_item(line: str) -> Optional[Dict]:
     if len(description) < 3 or description.replace(' ', '').isdigit():
         return None
     
+    # Heuristic: If we have 3 or more numbers, the pattern is likely: quantity, unit_price, total_price
+    # If we have exactly 2 numbers, assume quantity and price (calculate total).
+    # Only the numbers used are converted; every token the pattern
+    # matches is a valid float once the decimal comma is replaced.
+    if len(numbers) >= 3:
+        # Take the last 3 numbers as quantity, unit_price, total_price
+        quantity, unit_price, total_price = [float(n.replace(',', '.')) for n in numbers[-3:]]
+    else:
+        quantity, unit_price = [float(n.replace(',', '.')) for n in numbers]
+        # Amounts have cent precision; rounding keeps float artifacts
+        # such as 3 * 0.1 = 0.30000000000000004 out of the total
+        total_price = round(quantity * unit_price, 2)
+    
     return {
         'description': description,
         'sku': '',
@@ -289,29 +459,97 @@ def parse_line_item(line: str) -> Optional[Dict]:
 def normalize_date(date_str: str) -> str:
     """Normalize date string to ISO format (YYYY-MM-DD)."""
     # Try different date formats
-    patterns = [
-        (r'(\d{1,2})[\./-](\d{1,2})[\./-](\d{4})', lambda m: f"{m.group(3)}-{m.group(2).zfill(2)}-{m.group(1).zfill(2)}"),
-        (r'(\d{4})-(\d{2})-(\d{2})', lambda m: f"{m.group(1)}-{m.group(2)}-{m.group(3)}"),
-    ]
-    
-    for pattern, formatter in patterns:
-        match = re.match(pattern, date_str)
+    for pattern, formatter in _NORMALIZE_DATE_PATTERNS:
+        match = pattern.match(date_str)
         if match:
             return formatter(match)
     
     return date_str
 
 
-def parse_document(file_path: str, file_extension: str) -> Dict:
+def file_content_hash(file_path: str) -> str:
+    """Compute the content hash used as the parse cache key."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(PARSE_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LineItem(NamedTuple):
+    """Compact, immutable form of a parsed line item."""
+    description: str
+    sku: str
+    quantity: float
+    unit_price: float
+    total_price: float
+
+
+class CachedParse(NamedTuple):
+    """Parse result as kept in the parse cache."""
+    fields: Tuple[Tuple[str, object], ...]
+    items: Tuple[LineItem, ...]
+
+
+def _freeze_parse(result: Dict) -> CachedParse:
+    """Pack a parse result into tuples, which need no defensive copies."""
+    fields = tuple((name, value) for name, value in result.items() if name != 'items')
+    items = tuple(LineItem(**item) for item in result['items'])
+    return CachedParse(fields, items)
+
+
+def _thaw_parse(cached: CachedParse) -> Dict:
+    """Rebuild a fresh parse result dict that the caller may modify."""
+    result = dict(cached.fields)
+    result['items'] = [item._asdict() for item in cached.items]
+    return result
+
+
+def _get_cached_parse(key: Tuple[str, str]) -> Optional["CachedParse"]:
+    """Return the cached parse for a document, or None."""
+    with _parse_cache_lock:
+        cached = _parse_cache.get(key)
+        if cached is not None:
+            _parse_cache.move_to_end(key)
+        return cached
+
+
+def _cache_parse(key: Tuple[str, str], result: Dict) -> None:
+    """Remember a parse result, evicting the least recently used."""
+    cached = _freeze_parse(result)
+    with _parse_cache_lock:
+        _parse_cache[key] = cached
+        _parse_cache.move_to_end(key)
+        if len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+
+
+def parse_document(file_path: str, file_extension: str, content_hash: Optional[str] = None) -> Dict:
     """Parse document and extract invoice data.
     
+    Results are cached by file content, so re-uploading the same invoice
+    skips text extraction and parsing.
+    
     Args:
         file_path: Path to the document file
         file_extension: File extension (pdf, doc, docx, txt)
+        content_hash: Hash of the file content, if the caller already has one
     
     Returns:
         Dictionary with invoice data including items
     """
+    key = (content_hash or file_content_hash(file_path), file_extension)
+    cached = _get_cached_parse(key)
+    if cached is not None:
+        return _thaw_parse(cached)
+    
+    result = _parse_document(file_path, file_extension)
+    _cache_parse(key, result)
+    return result
+
+
+def _parse_document(file_path: str, file_extension: str) -> Dict:
+    """Extract and parse a document without consulting the cache."""
     text = extract_document_text(file_path, file_extension)
 
     if not text:
@@ -0,0 +1,52 @@
+"""HTTP conditional request helpers (ETag / Last-Modified) for list endpoints."""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from values that change whenever the data changes."""
+    digest = hashlib.blake2b(
+        ":".join(str(part) for part in parts).encode(), digest_size=8
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """Handle a conditional GET for a list endpoint.
+    
+    Sets the validator headers on the outgoing response. Clients must
+    revalidate on every use (``no-cache``), so a stale list is never shown.
+    
+    Args:
+        request: Incoming request, checked for If-None-Match
+        response: Response whose headers are updated
+        etag: Current ETag of the resource
+        last_modified: Naive UTC timestamp of the latest change, if known
+        
+    Returns:
+        A 304 response if the client's copy is current, otherwise None
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=timezone.utc), usegmt=True
+        )
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
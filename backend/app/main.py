@@ -1,15 +1,18 @@
 """FastAPI main application."""
 
 import os
+import re
 import logging
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from fastapi import FastAPI, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from sqlmodel import Session, select
+from sqlalchemy import func
 
 # Load environment variables from .env file
 load_dotenv()
@@ -26,7 +29,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="SolarApp API",
     description="Solar Panel Management System API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Add GZip compression middleware for better performance on slow connections
@@ -57,16 +61,48 @@ app.include_router(gsheets.router, dependencies=[Depends(get_current_user)])
 # First check if frontend is built in the parent directory structure
 frontend_dist = Path(__file__).parent.parent.parent / "frontend" / "dist"
 
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names change with their content.
+    
+    Vite puts a content hash in every asset file name, so browsers and
+    proxies may cache them for as long as they like.
+    """
+    
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# Static file paths the SPA fallback may look up inside frontend_dist
+SAFE_STATIC_PATH = re.compile(r'^[A-Za-z0-9_\-./]+$')
+
+# index.html is served for every SPA route; it is read once here instead
+# of on every request. Restart the app after rebuilding the frontend.
+index_html: Optional[bytes] = None
+
 # Mount static files if frontend is built
 if frontend_dist.exists() and frontend_dist.is_dir():
     # Mount static assets (js, css, images, etc.)
-    app.mount("/assets", StaticFiles(directory=str(frontend_dist / "assets")), name="assets")
+    app.mount("/assets", ImmutableStaticFiles(directory=str(frontend_dist / "assets")), name="assets")
+    
+    index_path = frontend_dist / "index.html"
+    if index_path.is_file():
+        index_html = index_path.read_bytes()
 
 
 @app.on_event("startup")
 def on_startup():
-    """Initialize database on startup."""
+    """Initialize database and shared HTTP clients on startup."""
     create_db_and_tables()
+    app.state.xml_client = invoices.create_xml_parser_client()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Close shared HTTP clients on shutdown."""
+    await app.state.xml_client.aclose()
 
 
 @app.get("/api/v1/dashboard/stats")
@@ -75,29 +111,20 @@ def get_dashboard_stats(
     _user=Depends(get_current_user),
 ):
     """Get dashboard statistics."""
-    # Total materials
-    total_materials = len(session.exec(select(Material)).all())
-    
-    # Low stock count
-    low_stock_count = 0
-    stocks = session.exec(select(Stock)).all()
-    for stock in stocks:
-        material = session.get(Material, stock.material_id)
-        if material and stock.quantity < material.min_stock:
-            low_stock_count += 1
-    
-    # Active projects
-    active_projects = len(
-        session.exec(
-            select(Project).where(
-                (Project.status == "planned") | 
-                (Project.status == "in_progress")
-            )
-        ).all()
-    )
-    
-    # Total projects
-    total_projects = len(session.exec(select(Project)).all())
+    # All four counts are computed by the database in a single round trip
+    total_materials, low_stock_count, active_projects, total_projects = session.exec(
+        select(
+            select(func.count(Material.id)).scalar_subquery(),
+            select(func.count(Stock.id))
+            .join(Material, Stock.material_id == Material.id)
+            .where(Stock.quantity < Material.min_stock)
+            .scalar_subquery(),
+            select(func.count(Project.id))
+            .where(Project.status.in_(("planned", "in_progress")))
+            .scalar_subquery(),
+            select(func.count(Project.id)).scalar_subquery(),
+        )
+    ).one()
     
     return {
         "total_materials": total_materials,
@@ -128,23 +155,29 @@ async def serve_frontend(full_path: str):
         }
     
     # Check if specific file exists (for static assets like vite.svg, favicon.ico)
-    # Prevent path traversal attacks by resolving and validating the path
-    try:
-        file_path = (frontend_dist / full_path).resolve()
-        # Ensure the resolved path is within frontend_dist
-        if file_path.is_relative_to(frontend_dist) and file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-    except (ValueError, RuntimeError, OSError) as e:
-        # Invalid path or OS error, continue to serve index.html
-        # Log the error in development mode without exposing full paths
-        if os.getenv("ENVIRONMENT") == "development":
-            logger.warning(f"Could not serve static file: {type(e).__name__}")
-        pass
+    # Prevent path traversal attacks with plain string checks: only
+    # relative paths of safe characters without ".." are looked up, so
+    # no resolve() is needed on this hot path
+    if (
+        full_path
+        and ".." not in full_path
+        and not full_path.startswith("/")
+        and SAFE_STATIC_PATH.match(full_path)
+    ):
+        try:
+            file_path = frontend_dist / full_path
+            if file_path.is_file():
+                return FileResponse(file_path)
+        except OSError as e:
+            # OS error, continue to serve index.html
+            # Log the error in development mode without exposing full paths
+            if os.getenv("ENVIRONMENT") == "development":
+                logger.warning(f"Could not serve static file: {type(e).__name__}")
     
-    # For all other routes, serve index.html (SPA routing)
-    index_path = frontend_dist / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
+    # For all other routes, serve index.html (SPA routing). It references
+    # the hashed asset names, so browsers must revalidate it.
+    if index_html is not None:
+        return HTMLResponse(content=index_html, headers={"Cache-Control": "no-cache"})
     
     # Fallback if index.html doesn't exist
     return {"message": "Frontend index.html not found", "api_docs": "/docs"}
@@ -0,0 +1,61 @@
+"""Process-wide cache of material reference data.
+
+Materials are read far more often than they change, so the handful of
+fields needed to label stock movements is kept in memory. Entries are
+keyed on the material's id and ``updated_at``: every lookup reads the
+current timestamp by primary key, so rows changed or deleted by another
+worker, a script or plain SQL are never served stale.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from sqlmodel import Session, select
+
+from .database import engine
+from .models import Material
+
+
+class MaterialInfo(NamedTuple):
+    """Serialization-relevant fields of a material."""
+    id: int
+    name: str
+    sku: str
+    category: str
+    min_stock: int
+
+
+@lru_cache(maxsize=1024)
+def _load_material_info(material_id: int, updated_at: Optional[datetime]) -> MaterialInfo:
+    with Session(engine) as session:
+        material = session.get(Material, material_id)
+        if material is None:
+            # Raising keeps misses out of the cache
+            raise LookupError(material_id)
+        return MaterialInfo(
+            id=material.id,
+            name=material.name,
+            sku=material.sku,
+            category=material.category,
+            min_stock=material.min_stock,
+        )
+
+
+def get_material_cached(session: Session, material_id: int) -> Optional[MaterialInfo]:
+    """Return cached material info, or None if the material does not exist."""
+    row = session.execute(
+        select(Material.updated_at).where(Material.id == material_id)
+    ).first()
+    if row is None:
+        return None
+    try:
+        return _load_material_info(material_id, row.updated_at)
+    except LookupError:
+        # Deleted between the timestamp lookup and the load
+        return None
+
+
+def invalidate_material_cache() -> None:
+    """Drop all cached material info, e.g. to free it after a change."""
+    _load_material_info.cache_clear()
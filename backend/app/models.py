@@ -1,9 +1,26 @@
 """Database models for SolarApp."""
 
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 from typing import Optional, List
 from sqlmodel import Field, SQLModel
-from pydantic import BaseModel
+from sqlalchemy import Index, func
+from pydantic import BaseModel, field_validator
+from pydantic.dataclasses import dataclass as pydantic_dataclass
+
+
+def utc_now() -> datetime:
+    """Return the current UTC time as a naive datetime, as stored in the database."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def timestamp_field():
+    """Timestamp column defaulting to the current UTC time.
+    
+    The ORM fills it in Python; the server default covers rows inserted
+    with plain SQL. Callers writing several rows at once should pass one
+    shared ``utc_now()`` value so the batch carries the same timestamp.
+    """
+    return Field(default_factory=utc_now, sa_column_kwargs={"server_default": func.now()})
 
 
 class Material(SQLModel, table=True):
@@ -17,23 +34,29 @@ class Material(SQLModel, table=True):
     unit: str = "buc"  # Unit of measurement
     unit_price: float = 0.0
     min_stock: int = 0
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = timestamp_field()
+    updated_at: datetime = timestamp_field()
 
 
 class Stock(SQLModel, table=True):
     """Stock model for tracking current inventory levels."""
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    material_id: int = Field(foreign_key="material.id")
+    material_id: int = Field(foreign_key="material.id", index=True)
     quantity: float = 0.0
     location: Optional[str] = "Main Warehouse"
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = timestamp_field()
 
 
 class StockMovement(SQLModel, table=True):
     """Stock movement model for tracking inventory changes."""
     
+    __table_args__ = (
+        # Movement history per material, newest first
+        Index("ix_stockmovement_material_created", "material_id", "created_at"),
+        Index("ix_stockmovement_created_at", "created_at"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     material_id: int = Field(foreign_key="material.id")
     movement_type: str  # "in", "out", "adjustment", "transfer"
@@ -42,7 +65,7 @@ class StockMovement(SQLModel, table=True):
     reference_type: Optional[str] = None  # "purchase", "project", "manual"
     reference_id: Optional[int] = None
     notes: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = timestamp_field()
     created_by: Optional[str] = None
 
 
@@ -55,7 +78,7 @@ class Project(SQLModel, table=True):
     client_contact: Optional[str] = None
     location: Optional[str] = None
     capacity_kw: Optional[float] = None  # System capacity in kW
-    status: str = "planned"  # "planned", "in_progress", "completed", "cancelled"
+    status: str = Field(default="planned", index=True)  # "planned", "in_progress", "completed", "cancelled"
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     estimated_cost: Optional[float] = None
@@ -68,16 +91,21 @@ class Project(SQLModel, table=True):
     other_costs_estimated: Optional[float] = None
     other_costs_actual: Optional[float] = None
     notes: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = timestamp_field()
+    updated_at: datetime = timestamp_field()
 
 
 class ProjectMaterial(SQLModel, table=True):
     """Many-to-many relationship between projects and materials."""
     
+    __table_args__ = (
+        # Materials of a project, and lookups of one material within it
+        Index("ix_projectmaterial_project_material", "project_id", "material_id"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     project_id: int = Field(foreign_key="project.id")
-    material_id: int = Field(foreign_key="material.id")
+    material_id: int = Field(foreign_key="material.id", index=True)
     quantity_planned: float = 0.0
     quantity_used: float = 0.0
     unit_price: float = 0.0
@@ -86,6 +114,10 @@ class ProjectMaterial(SQLModel, table=True):
 class Purchase(SQLModel, table=True):
     """Purchase model for tracking material purchases."""
     
+    __table_args__ = (
+        Index("ix_purchase_created_at", "created_at"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     supplier: str
     purchase_date: date
@@ -93,15 +125,15 @@ class Purchase(SQLModel, table=True):
     total_amount: float = 0.0
     currency: str = "RON"
     notes: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = timestamp_field()
 
 
 class PurchaseItem(SQLModel, table=True):
     """Purchase items model for individual items in a purchase."""
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    purchase_id: int = Field(foreign_key="purchase.id")
-    material_id: Optional[int] = Field(foreign_key="material.id")
+    purchase_id: int = Field(foreign_key="purchase.id", index=True)
+    material_id: Optional[int] = Field(foreign_key="material.id", index=True)
     description: str
     sku: Optional[str] = None
     quantity: float
@@ -121,7 +153,7 @@ class Invoice(SQLModel, table=True):
     xml_file_path: Optional[str] = None
     file_format: Optional[str] = None  # File extension: xml, pdf, doc, xls, txt
     purchase_id: Optional[int] = Field(foreign_key="purchase.id")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = timestamp_field()
 
 
 # Request/Response Models (Pydantic models for API validation)
@@ -136,7 +168,8 @@ class PurchaseItemCreate(BaseModel):
     total_price: float
 
 
-class PurchaseItemUpdate(BaseModel):
+@pydantic_dataclass(slots=True)
+class PurchaseItemUpdate:
     """Model for updating purchase items."""
     description: Optional[str] = None
     sku: Optional[str] = None
@@ -156,14 +189,16 @@ class PurchaseCreate(BaseModel):
     items: List[PurchaseItemCreate] = []
 
 
-class ProjectMaterialUpdate(BaseModel):
+@pydantic_dataclass(slots=True)
+class ProjectMaterialUpdate:
     """Model for updating project materials."""
     quantity_planned: Optional[float] = None
     quantity_used: Optional[float] = None
     unit_price: Optional[float] = None
 
 
-class MaterialUsed(BaseModel):
+@pydantic_dataclass(slots=True)
+class MaterialUsed:
     """Model for materials used in a project."""
     material_id: int
     quantity: float
@@ -173,7 +208,8 @@ class ProjectUpdate(BaseModel):
     """Model for updating projects with proper date handling.
     
     Dates should be provided as ISO 8601 strings (YYYY-MM-DD format).
-    For example: "2024-03-15" for March 15, 2024.
+    For example: "2024-03-15" for March 15, 2024. They are parsed into
+    ``date`` objects during validation; empty strings mean no date.
     """
     name: str
     client_name: str
@@ -181,8 +217,8 @@ class ProjectUpdate(BaseModel):
     location: Optional[str] = None
     capacity_kw: Optional[float] = None
     status: str
-    start_date: Optional[str] = None  # ISO 8601 date string (YYYY-MM-DD)
-    end_date: Optional[str] = None    # ISO 8601 date string (YYYY-MM-DD)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
     estimated_cost: Optional[float] = None
     actual_cost: Optional[float] = None
     labor_cost_estimated: Optional[float] = None
@@ -192,3 +228,86 @@ class ProjectUpdate(BaseModel):
     other_costs_estimated: Optional[float] = None
     other_costs_actual: Optional[float] = None
     notes: Optional[str] = None
+    
+    @field_validator("start_date", "end_date", mode="before")
+    @classmethod
+    def empty_date_to_none(cls, value):
+        """Treat an empty date field from a form as no date."""
+        return value or None
+
+
+class StockWithMaterial(BaseModel):
+    """Stock row joined with the material fields shown next to it."""
+    id: int
+    material_id: int
+    quantity: float
+    location: Optional[str] = None
+    updated_at: datetime
+    material_name: str
+    material_sku: str
+    material_category: str
+    min_stock: int
+    acquisition_price: Optional[float] = None
+
+
+class StockListItem(StockWithMaterial):
+    """Stock list entry flagged when below its minimum."""
+    is_low: bool
+
+
+class LowStockItem(StockWithMaterial):
+    """Stock entry below its minimum with the missing quantity."""
+    shortage: float
+
+
+class MovementWithMaterial(BaseModel):
+    """Stock movement with the name and SKU of its material."""
+    id: int
+    material_id: int
+    movement_type: str
+    quantity: float
+    unit_price: Optional[float] = None
+    reference_type: Optional[str] = None
+    reference_id: Optional[int] = None
+    notes: Optional[str] = None
+    created_at: datetime
+    created_by: Optional[str] = None
+    material_name: Optional[str] = None  # None if the material was deleted
+    material_sku: Optional[str] = None
+
+
+class PurchaseListItem(BaseModel):
+    """Purchase summary for list views; details come from the purchase endpoint."""
+    id: int
+    supplier: str
+    purchase_date: date
+    invoice_number: Optional[str] = None
+    total_amount: float
+    currency: str
+    created_at: datetime
+
+
+class PurchaseItemWithMaterial(BaseModel):
+    """Purchase item with the name of its matched material, if any."""
+    id: int
+    purchase_id: int
+    material_id: Optional[int] = None
+    description: str
+    sku: Optional[str] = None
+    quantity: float
+    unit_price: float
+    total_price: float
+    material_name: Optional[str] = None
+
+
+class PurchaseWithItems(BaseModel):
+    """Purchase details including its items."""
+    id: int
+    supplier: str
+    purchase_date: date
+    invoice_number: Optional[str] = None
+    total_amount: float
+    currency: str
+    notes: Optional[str] = None
+    created_at: datetime
+    items: List[PurchaseItemWithMaterial] = []
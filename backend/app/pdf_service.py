@@ -1,7 +1,15 @@
 """PDF generation service for commercial offers."""
 
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
+from typing import Optional
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -9,30 +17,242 @@ from reportlab.lib.units import mm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 
+from .text_utils import remove_diacritics
 
-def remove_diacritics(text):
-    """
-    Remove Romanian diacritics from text.
-    Converts: ă→a, â→a, î→i, ș→s, ț→t (both uppercase and lowercase)
-    """
-    if not text:
-        return text
-    
-    if not isinstance(text, str):
-        text = str(text)
-    
-    diacritics_map = {
-        'ă': 'a', 'Ă': 'A',
-        'â': 'a', 'Â': 'A',
-        'î': 'i', 'Î': 'I',
-        'ș': 's', 'Ș': 'S',
-        'ț': 't', 'Ț': 'T'
-    }
-    
-    for diacritic, replacement in diacritics_map.items():
-        text = text.replace(diacritic, replacement)
-    
-    return text
+
+# Chunk size used when streaming generated PDFs to the client (64 KB)
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Generated PDFs up to this size stay in memory; larger ones spill to a
+# temporary file while being rendered and streamed (1 MB)
+PDF_SPOOL_MAX_SIZE = 1 << 20
+
+# Worker processes rendering offer PDFs. ReportLab layout is pure Python
+# and holds the GIL, so concurrent exports only use several cores when
+# rendered in separate processes. 0 (the default) renders in the request
+# thread, which suits single-core boards such as the Raspberry Pi.
+PDF_RENDER_WORKERS = int(os.getenv("SOLARAPP_PDF_WORKERS", "0"))
+_pdf_render_pool: Optional[ProcessPoolExecutor] = None
+_pdf_render_pool_lock = threading.Lock()
+
+# In-process LRU cache of rendered offer PDFs keyed by offer_cache_key.
+# PDFs larger than PDF_SPOOL_MAX_SIZE are not cached.
+OFFER_PDF_CACHE_SIZE = 32
+_offer_pdf_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_offer_pdf_cache_lock = threading.Lock()
+
+# Colors, paragraph styles and shared table styles are built once at
+# import instead of on every PDF; ReportLab only reads them when rendering
+BRAND_BLUE = colors.HexColor('#1e40af')
+ROW_ALT_GRAY = colors.HexColor('#f3f4f6')
+SUBTOTAL_BLUE = colors.HexColor('#dbeafe')
+
+_STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    textColor=BRAND_BLUE,
+    spaceAfter=20,
+    alignment=TA_CENTER
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=14,
+    textColor=BRAND_BLUE,
+    spaceAfter=12,
+    spaceBefore=12
+)
+
+# Derived rather than edited in place, so the stylesheet's own Normal
+# style (the parent of the other styles) stays untouched
+NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=_STYLES['Normal'],
+    fontSize=10,
+    leading=14
+)
+
+# Style of the two-column "label: value" tables (offer, client, project)
+LABEL_VALUE_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
+    ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 10),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+# Style of the BOM table: header row, body rows and the subtotal row
+MATERIALS_TABLE_STYLE = TableStyle([
+    # Header style
+    ('BACKGROUND', (0, 0), (-1, 0), BRAND_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+    
+    # Body style
+    ('FONT', (0, 1), (-1, -2), 'Helvetica', 9),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+    ('ALIGN', (3, 1), (-1, -2), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 1), (-1, -2), 8),
+    ('BOTTOMPADDING', (0, 1), (-1, -2), 8),
+    
+    # Alternating row colors
+    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ROW_ALT_GRAY]),
+    
+    # Subtotal row style
+    ('FONT', (0, -1), (-1, -1), 'Helvetica-Bold', 11),
+    ('ALIGN', (0, -1), (-1, -1), 'RIGHT'),
+    ('BACKGROUND', (0, -1), (-1, -1), SUBTOTAL_BLUE),
+    ('TOPPADDING', (0, -1), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+    
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+# Style of the additional costs table, ending in its subtotal row
+ADDITIONAL_COSTS_TABLE_STYLE = TableStyle([
+    # Header style
+    ('BACKGROUND', (0, 0), (-1, 0), BRAND_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    
+    # Body style
+    ('FONT', (0, 1), (-1, -2), 'Helvetica', 10),
+    ('ALIGN', (0, 1), (0, -2), 'LEFT'),
+    ('ALIGN', (1, 1), (1, -2), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 1), (-1, -2), 8),
+    ('BOTTOMPADDING', (0, 1), (-1, -2), 8),
+    
+    # Alternating row colors
+    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, ROW_ALT_GRAY]),
+    
+    # Subtotal row style
+    ('FONT', (0, -1), (-1, -1), 'Helvetica-Bold', 11),
+    ('ALIGN', (0, -1), (-1, -1), 'RIGHT'),
+    ('BACKGROUND', (0, -1), (-1, -1), SUBTOTAL_BLUE),
+    ('TOPPADDING', (0, -1), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+    
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+GRAND_TOTAL_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', 14),
+    ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+    ('BACKGROUND', (0, 0), (-1, -1), BRAND_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.whitesmoke),
+    ('TOPPADDING', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, BRAND_BLUE),
+])
+
+ESTIMATED_COST_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', 12),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+])
+
+# Column widths (landscape A4 leaves 257mm between the margins)
+LABEL_VALUE_COL_WIDTHS = [70*mm, 100*mm]
+TOTALS_COL_WIDTHS = [110*mm, 40*mm]
+MATERIALS_COL_WIDTHS = [15*mm, 80*mm, 40*mm, 25*mm, 45*mm, 35*mm]
+
+# Page margin and vertical gaps between sections
+PAGE_MARGIN = 20*mm
+SECTION_GAP = 10*mm
+TABLE_GAP = 5*mm
+TERMS_GAP = 15*mm
+TERM_GAP = 2*mm
+
+# Terms paragraphs carry their own gap instead of a Spacer after each one
+TERM_STYLE = ParagraphStyle(
+    'OfferTerm',
+    parent=NORMAL_STYLE,
+    spaceAfter=TERM_GAP
+)
+
+
+# Terms and conditions printed at the end of every offer, without
+# diacritics. Only the text is shared: Paragraph keeps layout state from
+# wrap(), so the flowables are built per PDF and never shared between
+# concurrent renders.
+OFFER_TERMS = tuple(remove_diacritics(term) for term in (
+    "• Prețurile sunt exprimate în RON și nu includ TVA.",
+    "• Oferta este valabilă 30 de zile de la data emiterii.",
+    "• Timpul de livrare va fi confirmat la plasarea comenzii.",
+    "• Montajul și punerea în funcțiune sunt incluse în preț.",
+    "• Garanție conform specificațiilor producătorilor.",
+))
+
+
+# Fixed headings and labels of the offer, stripped of diacritics once
+OFFER_TITLE = remove_diacritics("OFERTĂ COMERCIALĂ")
+OFFER_DETAILS_HEADING = remove_diacritics("Detalii Ofertă")
+CLIENT_HEADING = remove_diacritics("Date Client")
+PROJECT_HEADING = remove_diacritics("Detalii Proiect")
+MATERIALS_HEADING = remove_diacritics("Materiale și Costuri")
+ADDITIONAL_COSTS_HEADING = remove_diacritics("Costuri Adiționale")
+ESTIMATED_COST_HEADING = remove_diacritics("Estimare Cost")
+NOTES_HEADING = remove_diacritics("Note")
+TERMS_HEADING = remove_diacritics("Termeni și Condiții")
+
+OFFER_DATE_LABEL = remove_diacritics('Data ofertei:')
+OFFER_NUMBER_LABEL = remove_diacritics('Nr. ofertă:')
+VALIDITY_LABEL = remove_diacritics('Valabilitate:')
+VALIDITY_VALUE = remove_diacritics('30 zile')
+CLIENT_NAME_LABEL = remove_diacritics('Nume client:')
+CONTACT_LABEL = remove_diacritics('Contact:')
+LOCATION_LABEL = remove_diacritics('Locație:')
+PROJECT_NAME_LABEL = remove_diacritics('Nume proiect:')
+CAPACITY_LABEL = remove_diacritics('Capacitate sistem:')
+STATUS_LABEL = remove_diacritics('Status:')
+START_DATE_LABEL = remove_diacritics('Data start estimată:')
+ESTIMATED_COST_LABEL = remove_diacritics('Cost estimat total:')
+
+MATERIALS_HEADERS = tuple(remove_diacritics(header) for header in (
+    'Nr.', 'Material', 'SKU', 'Cantitate', 'Preț Unitar cu Adaos (RON)', 'Total (RON)',
+))
+MATERIALS_SUBTOTAL_LABEL = remove_diacritics('SUBTOTAL MATERIALE (cu adaos):')
+
+ADDITIONAL_COSTS_HEADER = (remove_diacritics('Tip Cost'), remove_diacritics('Valoare (RON)'))
+LABOR_COST_LABEL = remove_diacritics('Manoperă')
+TRANSPORT_COST_LABEL = remove_diacritics('Transport')
+OTHER_COSTS_LABEL = remove_diacritics('Alte costuri')
+ADDITIONAL_COSTS_SUBTOTAL_LABEL = remove_diacritics('SUBTOTAL COSTURI ADIȚIONALE:')
+GRAND_TOTAL_LABEL = remove_diacritics('TOTAL GENERAL:')
+
+
+@lru_cache(maxsize=None)
+def cell_text_style(style_name='Normal', font_size=9):
+    """Paragraph style for wrapped table cell text, built once per size."""
+    return ParagraphStyle(
+        name='CellText',
+        parent=_STYLES[style_name],
+        fontSize=font_size,
+        leading=font_size * 1.2,
+        alignment=TA_LEFT
+    )
 
 
 def wrap_text(text, style_name='Normal', font_size=9):
@@ -47,15 +267,7 @@ def wrap_text(text, style_name='Normal', font_size=9):
     Returns:
         Paragraph object with wrapped text
     """
-    styles = getSampleStyleSheet()
-    style = ParagraphStyle(
-        name='CellText',
-        parent=styles[style_name],
-        fontSize=font_size,
-        leading=font_size * 1.2,
-        alignment=TA_LEFT
-    )
-    return Paragraph(str(text), style)
+    return Paragraph(str(text), cell_text_style(style_name, font_size))
 
 
 def create_additional_costs_table_data(labor_cost, transport_cost, other_costs, subtotal_label):
@@ -72,22 +284,22 @@ def create_additional_costs_table_data(labor_cost, transport_cost, other_costs,
         List of lists containing table data
     """
     additional_costs_data = [
-        [remove_diacritics('Tip Cost'), remove_diacritics('Valoare (RON)')]
+        list(ADDITIONAL_COSTS_HEADER)
     ]
     
     # Always show all cost types, even if 0
     additional_costs_data.append([
-        remove_diacritics('Manoperă'),
+        LABOR_COST_LABEL,
         f"{labor_cost:.2f}"
     ])
     
     additional_costs_data.append([
-        remove_diacritics('Transport'),
+        TRANSPORT_COST_LABEL,
         f"{transport_cost:.2f}"
     ])
     
     additional_costs_data.append([
-        remove_diacritics('Alte costuri'),
+        OTHER_COSTS_LABEL,
         f"{other_costs:.2f}"
     ])
     
@@ -106,39 +318,24 @@ def get_additional_costs_table_style():
     Get the standard table style for additional costs tables.
     
     Returns:
-        TableStyle object
+        TableStyle object, shared between tables and built once
     """
-    return TableStyle([
-        # Header style
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        
-        # Body style
-        ('FONT', (0, 1), (-1, -2), 'Helvetica', 10),
-        ('ALIGN', (0, 1), (0, -2), 'LEFT'),
-        ('ALIGN', (1, 1), (1, -2), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 1), (-1, -2), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -2), 8),
-        
-        # Alternating row colors
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f3f4f6')]),
-        
-        # Subtotal row style
-        ('FONT', (0, -1), (-1, -1), 'Helvetica-Bold', 11),
-        ('ALIGN', (0, -1), (-1, -1), 'RIGHT'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#dbeafe')),
-        ('TOPPADDING', (0, -1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-        
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ])
+    return ADDITIONAL_COSTS_TABLE_STYLE
+
+
+def create_label_value_table(data):
+    """
+    Create a two-column label/value table.
+    
+    Args:
+        data: List of [label, value] rows
+    
+    Returns:
+        Table object
+    """
+    table = Table(data, colWidths=LABEL_VALUE_COL_WIDTHS)
+    table.setStyle(LABEL_VALUE_TABLE_STYLE)
+    return table
 
 
 def create_grand_total_table(total_amount):
@@ -152,19 +349,11 @@ def create_grand_total_table(total_amount):
         Table object
     """
     grand_total_data = [
-        [remove_diacritics('TOTAL GENERAL:'), f"{total_amount:.2f} RON"]
+        [GRAND_TOTAL_LABEL, f"{total_amount:.2f} RON"]
     ]
     
-    grand_total_table = Table(grand_total_data, colWidths=[110*mm, 40*mm])
-    grand_total_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', 14),
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#1e40af')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.whitesmoke),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#1e40af')),
-    ]))
+    grand_total_table = Table(grand_total_data, colWidths=TOTALS_COL_WIDTHS)
+    grand_total_table.setStyle(GRAND_TOTAL_TABLE_STYLE)
     
     return grand_total_table
 
@@ -178,281 +367,282 @@ def generate_commercial_offer_pdf(project_data, materials_list=None):
         materials_list: List of materials with quantities and prices
     
     Returns:
-        BytesIO: PDF file as bytes
+        bytes: PDF file as bytes
     """
     buffer = BytesIO()
+    build_commercial_offer_pdf(buffer, project_data, materials_list)
+    
+    # Get the value of the BytesIO buffer
+    pdf = buffer.getvalue()
+    buffer.close()
+    
+    return pdf
+
+
+def offer_cache_key(project_data, materials_list=None):
+    """
+    Hash everything a rendered offer depends on.
     
+    The offer shows today's date and its number contains it, so the date
+    is part of the key along with the project and material data.
+    
+    Args:
+        project_data: Dictionary containing project information
+        materials_list: List of materials with quantities and prices
+    
+    Returns:
+        str: Hex digest identifying the rendered PDF
+    """
+    payload = json.dumps(
+        [datetime.now().strftime("%Y%m%d"), project_data, materials_list or []],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def get_cached_offer_pdf(key) -> Optional[bytes]:
+    """Return a previously rendered offer PDF, or None."""
+    with _offer_pdf_cache_lock:
+        pdf = _offer_pdf_cache.get(key)
+        if pdf is not None:
+            _offer_pdf_cache.move_to_end(key)
+        return pdf
+
+
+def cache_offer_pdf(key, pdf: bytes):
+    """Remember a rendered offer PDF, evicting the least recently used."""
+    if len(pdf) > PDF_SPOOL_MAX_SIZE:
+        return
+    with _offer_pdf_cache_lock:
+        _offer_pdf_cache[key] = pdf
+        _offer_pdf_cache.move_to_end(key)
+        if len(_offer_pdf_cache) > OFFER_PDF_CACHE_SIZE:
+            _offer_pdf_cache.popitem(last=False)
+
+
+def render_offer_pdf_in_pool(project_data, materials_list=None):
+    """
+    Render a commercial offer PDF in the worker process pool.
+    
+    Only used when PDF_RENDER_WORKERS is set; the pool is started on
+    first use. The arguments must be picklable, which plain dicts are.
+    
+    Args:
+        project_data: Dictionary containing project information
+        materials_list: List of materials with quantities and prices
+    
+    Returns:
+        bytes: PDF file as bytes
+    """
+    global _pdf_render_pool
+    with _pdf_render_pool_lock:
+        if _pdf_render_pool is None:
+            _pdf_render_pool = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS)
+    return _pdf_render_pool.submit(
+        generate_commercial_offer_pdf, project_data, materials_list
+    ).result()
+
+
+def iter_file_chunks(file_obj, chunk_size=PDF_STREAM_CHUNK_SIZE):
+    """
+    Yield the contents of a binary file-like object in fixed-size chunks.
+    
+    Args:
+        file_obj: Readable binary file-like object, positioned at the start
+        chunk_size: Maximum number of bytes per chunk
+    
+    Yields:
+        bytes: Consecutive chunks of the file
+    """
+    try:
+        while chunk := file_obj.read(chunk_size):
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+def build_commercial_offer_pdf(output, project_data, materials_list=None):
+    """
+    Render a commercial offer PDF for a project into a file-like object.
+    
+    Args:
+        output: Writable binary file-like object receiving the PDF
+        project_data: Dictionary containing project information
+        materials_list: List of materials with quantities and prices
+    """
     # Create the PDF document in landscape format
     doc = SimpleDocTemplate(
-        buffer,
+        output,
         pagesize=landscape(A4),
-        rightMargin=20*mm,
-        leftMargin=20*mm,
-        topMargin=20*mm,
-        bottomMargin=20*mm
+        rightMargin=PAGE_MARGIN,
+        leftMargin=PAGE_MARGIN,
+        topMargin=PAGE_MARGIN,
+        bottomMargin=PAGE_MARGIN
     )
     
     # Container for the 'Flowable' objects
     elements = []
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
-    normal_style.leading = 14
-    
-    # Add Title
-    elements.append(Paragraph(remove_diacritics("OFERTĂ COMERCIALĂ"), title_style))
-    elements.append(Spacer(1, 10*mm))
+    # Read each project field once
+    project_id = project_data.get('id', 'N/A')
+    capacity_kw = project_data.get('capacity_kw')
+    start_date = project_data.get('start_date')
+    estimated_cost = project_data.get('estimated_cost')
+    notes = project_data.get('notes')
+    labor_cost = project_data.get('labor_cost_estimated', 0) or 0
+    transport_cost = project_data.get('transport_cost_estimated', 0) or 0
+    other_costs = project_data.get('other_costs_estimated', 0) or 0
     
     # Add Offer Details Section
-    elements.append(Paragraph(remove_diacritics("Detalii Ofertă"), heading_style))
-    
-    offer_date = datetime.now().strftime("%d.%m.%Y")
+    now = datetime.now()
+    offer_date = now.strftime("%d.%m.%Y")
     offer_details = [
-        [remove_diacritics('Data ofertei:'), offer_date],
-        [remove_diacritics('Nr. ofertă:'), f"OF-{project_data.get('id', 'N/A')}-{datetime.now().strftime('%Y%m%d')}"],
-        [remove_diacritics('Valabilitate:'), remove_diacritics('30 zile')],
+        [OFFER_DATE_LABEL, offer_date],
+        [OFFER_NUMBER_LABEL, f"OF-{project_id}-{now.strftime('%Y%m%d')}"],
+        [VALIDITY_LABEL, VALIDITY_VALUE],
     ]
     
-    offer_table = Table(offer_details, colWidths=[70*mm, 100*mm])
-    offer_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 10),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(offer_table)
-    elements.append(Spacer(1, 10*mm))
+    offer_table = create_label_value_table(offer_details)
     
     # Add Client Information
-    elements.append(Paragraph(remove_diacritics("Date Client"), heading_style))
-    
     client_info = [
-        [remove_diacritics('Nume client:'), remove_diacritics(project_data.get('client_name', 'N/A'))],
-        [remove_diacritics('Contact:'), remove_diacritics(project_data.get('client_contact', 'N/A'))],
-        [remove_diacritics('Locație:'), remove_diacritics(project_data.get('location', 'N/A'))],
+        [CLIENT_NAME_LABEL, remove_diacritics(project_data.get('client_name', 'N/A'))],
+        [CONTACT_LABEL, remove_diacritics(project_data.get('client_contact', 'N/A'))],
+        [LOCATION_LABEL, remove_diacritics(project_data.get('location', 'N/A'))],
     ]
     
-    client_table = Table(client_info, colWidths=[70*mm, 100*mm])
-    client_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 10),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(client_table)
-    elements.append(Spacer(1, 10*mm))
+    client_table = create_label_value_table(client_info)
     
     # Add Project Information
-    elements.append(Paragraph(remove_diacritics("Detalii Proiect"), heading_style))
-    
     project_info = [
-        [remove_diacritics('Nume proiect:'), remove_diacritics(project_data.get('name', 'N/A'))],
-        [remove_diacritics('Capacitate sistem:'), f"{project_data.get('capacity_kw', 0)} kW" if project_data.get('capacity_kw') else 'N/A'],
-        [remove_diacritics('Status:'), remove_diacritics(project_data.get('status', 'N/A').replace('_', ' ').title())],
+        [PROJECT_NAME_LABEL, remove_diacritics(project_data.get('name', 'N/A'))],
+        [CAPACITY_LABEL, f"{capacity_kw} kW" if capacity_kw else 'N/A'],
+        [STATUS_LABEL, remove_diacritics(project_data.get('status', 'N/A').replace('_', ' ').title())],
     ]
     
-    if project_data.get('start_date'):
-        project_info.append([remove_diacritics('Data start estimată:'), str(project_data.get('start_date'))])
-    
-    project_table = Table(project_info, colWidths=[70*mm, 100*mm])
-    project_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
-        ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 10),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(project_table)
-    elements.append(Spacer(1, 10*mm))
+    if start_date:
+        project_info.append([START_DATE_LABEL, str(start_date)])
+    
+    project_table = create_label_value_table(project_info)
+    
+    # Title and the three detail sections, each added in one step
+    elements.extend([
+        Paragraph(OFFER_TITLE, TITLE_STYLE),
+        Spacer(1, SECTION_GAP),
+        Paragraph(OFFER_DETAILS_HEADING, HEADING_STYLE),
+        offer_table,
+        Spacer(1, SECTION_GAP),
+        Paragraph(CLIENT_HEADING, HEADING_STYLE),
+        client_table,
+        Spacer(1, SECTION_GAP),
+        Paragraph(PROJECT_HEADING, HEADING_STYLE),
+        project_table,
+        Spacer(1, SECTION_GAP),
+    ])
     
     # Add Materials List (if provided)
     if materials_list and len(materials_list) > 0:
-        elements.append(Paragraph(remove_diacritics("Materiale și Costuri"), heading_style))
-        
         # Materials table header with wrapped text
         materials_data = [
-            [
-                wrap_text(remove_diacritics('Nr.'), font_size=10),
-                wrap_text(remove_diacritics('Material'), font_size=10),
-                wrap_text(remove_diacritics('SKU'), font_size=10),
-                wrap_text(remove_diacritics('Cantitate'), font_size=10),
-                wrap_text(remove_diacritics('Preț Unitar cu Adaos (RON)'), font_size=10),
-                wrap_text(remove_diacritics('Total (RON)'), font_size=10)
-            ]
+            [wrap_text(header, font_size=10) for header in MATERIALS_HEADERS]
         ]
         
+        # Each field is read from the material dict once
         total_cost = 0
         for idx, material in enumerate(materials_list, 1):
-            material_total = material.get('quantity_planned', 0) * material.get('unit_price', 0)
+            quantity = material.get('quantity_planned', 0) or 0
+            unit_price = material.get('unit_price', 0) or 0
+            material_total = quantity * unit_price
             total_cost += material_total
             
             materials_data.append([
                 str(idx),
                 wrap_text(remove_diacritics(material.get('material_name', 'N/A')), font_size=9),
                 wrap_text(remove_diacritics(material.get('material_sku', 'N/A')), font_size=9),
-                f"{material.get('quantity_planned', 0):.2f}",
-                f"{material.get('unit_price', 0):.2f}",
+                f"{quantity:.2f}",
+                f"{unit_price:.2f}",
                 f"{material_total:.2f}"
             ])
         
         # Add subtotal row for materials
-        materials_data.append(['', '', '', '', remove_diacritics('SUBTOTAL MATERIALE (cu adaos):'), f"{total_cost:.2f}"])
+        materials_data.append(['', '', '', '', MATERIALS_SUBTOTAL_LABEL, f"{total_cost:.2f}"])
         
         # Adjusted column widths for landscape format (total width 240mm for landscape A4)
-        materials_table = Table(materials_data, colWidths=[15*mm, 80*mm, 40*mm, 25*mm, 45*mm, 35*mm])
-        materials_table.setStyle(TableStyle([
-            # Header style
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('TOPPADDING', (0, 0), (-1, 0), 12),
-            ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
-            
-            # Body style
-            ('FONT', (0, 1), (-1, -2), 'Helvetica', 9),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (3, 1), (-1, -2), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 1), (-1, -2), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, -2), 8),
-            
-            # Alternating row colors
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f3f4f6')]),
-            
-            # Subtotal row style
-            ('FONT', (0, -1), (-1, -1), 'Helvetica-Bold', 11),
-            ('ALIGN', (0, -1), (-1, -1), 'RIGHT'),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#dbeafe')),
-            ('TOPPADDING', (0, -1), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-            
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(materials_table)
-        elements.append(Spacer(1, 5*mm))
+        materials_table = Table(materials_data, colWidths=MATERIALS_COL_WIDTHS)
+        materials_table.setStyle(MATERIALS_TABLE_STYLE)
         
         # Add Additional Costs Section (always show when materials exist)
-        labor_cost = project_data.get('labor_cost_estimated', 0) or 0
-        transport_cost = project_data.get('transport_cost_estimated', 0) or 0
-        other_costs = project_data.get('other_costs_estimated', 0) or 0
-        
-        elements.append(Paragraph(remove_diacritics("Costuri Adiționale"), heading_style))
-        
         # Create additional costs table using helper function
         additional_costs_data = create_additional_costs_table_data(
             labor_cost, transport_cost, other_costs, 
-            'SUBTOTAL COSTURI ADIȚIONALE:'
+            ADDITIONAL_COSTS_SUBTOTAL_LABEL
         )
         
-        additional_costs_table = Table(additional_costs_data, colWidths=[110*mm, 40*mm])
+        additional_costs_table = Table(additional_costs_data, colWidths=TOTALS_COL_WIDTHS)
         additional_costs_table.setStyle(get_additional_costs_table_style())
-        elements.append(additional_costs_table)
-        elements.append(Spacer(1, 5*mm))
         
         # Add Grand Total
         subtotal_additional = labor_cost + transport_cost + other_costs
         grand_total = total_cost + subtotal_additional
-        elements.append(create_grand_total_table(grand_total))
-        elements.append(Spacer(1, 10*mm))
+        
+        elements.extend([
+            Paragraph(MATERIALS_HEADING, HEADING_STYLE),
+            materials_table,
+            Spacer(1, TABLE_GAP),
+            Paragraph(ADDITIONAL_COSTS_HEADING, HEADING_STYLE),
+            additional_costs_table,
+            Spacer(1, TABLE_GAP),
+            create_grand_total_table(grand_total),
+            Spacer(1, SECTION_GAP),
+        ])
     
     # Add pricing section (if no materials provided, show additional costs and estimated cost)
     if not materials_list or len(materials_list) == 0:
-        labor_cost = project_data.get('labor_cost_estimated', 0) or 0
-        transport_cost = project_data.get('transport_cost_estimated', 0) or 0
-        other_costs = project_data.get('other_costs_estimated', 0) or 0
-        
         # Show additional costs if any exist
         if labor_cost > 0 or transport_cost > 0 or other_costs > 0:
-            elements.append(Paragraph(remove_diacritics("Costuri Adiționale"), heading_style))
-            
             # Create additional costs table using helper function (use consistent label)
             additional_costs_data = create_additional_costs_table_data(
                 labor_cost, transport_cost, other_costs, 
-                'SUBTOTAL COSTURI ADIȚIONALE:'
+                ADDITIONAL_COSTS_SUBTOTAL_LABEL
             )
             
-            additional_costs_table = Table(additional_costs_data, colWidths=[110*mm, 40*mm])
+            additional_costs_table = Table(additional_costs_data, colWidths=TOTALS_COL_WIDTHS)
             additional_costs_table.setStyle(get_additional_costs_table_style())
-            elements.append(additional_costs_table)
-            elements.append(Spacer(1, 10*mm))
+            elements.extend([
+                Paragraph(ADDITIONAL_COSTS_HEADING, HEADING_STYLE),
+                additional_costs_table,
+                Spacer(1, SECTION_GAP),
+            ])
         
         # Show estimated cost if provided
-        if project_data.get('estimated_cost'):
-            elements.append(Paragraph(remove_diacritics("Estimare Cost"), heading_style))
+        if estimated_cost:
             cost_data = [
-                [remove_diacritics('Cost estimat total:'), f"{project_data.get('estimated_cost', 0):.2f} RON"]
+                [ESTIMATED_COST_LABEL, f"{estimated_cost:.2f} RON"]
             ]
-            cost_table = Table(cost_data, colWidths=[70*mm, 100*mm])
-            cost_table.setStyle(TableStyle([
-                ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', 12),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elements.append(cost_table)
-            elements.append(Spacer(1, 10*mm))
+            cost_table = Table(cost_data, colWidths=LABEL_VALUE_COL_WIDTHS)
+            cost_table.setStyle(ESTIMATED_COST_TABLE_STYLE)
+            elements.extend([
+                Paragraph(ESTIMATED_COST_HEADING, HEADING_STYLE),
+                cost_table,
+                Spacer(1, SECTION_GAP),
+            ])
     
     # Add Notes
-    if project_data.get('notes'):
-        elements.append(Paragraph(remove_diacritics("Note"), heading_style))
-        elements.append(Paragraph(remove_diacritics(project_data.get('notes')), normal_style))
-        elements.append(Spacer(1, 10*mm))
+    if notes:
+        elements.extend([
+            Paragraph(NOTES_HEADING, HEADING_STYLE),
+            Paragraph(remove_diacritics(notes), NORMAL_STYLE),
+            Spacer(1, SECTION_GAP),
+        ])
     
     # Add Footer with Terms
-    elements.append(Spacer(1, 15*mm))
-    elements.append(Paragraph(remove_diacritics("Termeni și Condiții"), heading_style))
-    
-    terms = [
-        remove_diacritics("• Prețurile sunt exprimate în RON și nu includ TVA."),
-        remove_diacritics("• Oferta este valabilă 30 de zile de la data emiterii."),
-        remove_diacritics("• Timpul de livrare va fi confirmat la plasarea comenzii."),
-        remove_diacritics("• Montajul și punerea în funcțiune sunt incluse în preț."),
-        remove_diacritics("• Garanție conform specificațiilor producătorilor.")
-    ]
+    elements.extend([
+        Spacer(1, TERMS_GAP),
+        Paragraph(TERMS_HEADING, HEADING_STYLE),
+    ])
     
-    for term in terms:
-        elements.append(Paragraph(term, normal_style))
-        elements.append(Spacer(1, 2*mm))
+    elements.extend(Paragraph(term, TERM_STYLE) for term in OFFER_TERMS)
     
     # Build PDF
     doc.build(elements)
-    
-    # Get the value of the BytesIO buffer
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    return pdf
@@ -0,0 +1,44 @@
+"""Text helpers shared by the PDF and Word offer generators."""
+
+from functools import lru_cache
+
+
+# Romanian diacritics and their ASCII replacements. Ten str.replace
+# passes beat str.translate here: replace searches in C, while translate
+# does a dict lookup for every character of a non-ASCII string.
+DIACRITICS = (
+    ('ă', 'a'), ('Ă', 'A'),
+    ('â', 'a'), ('Â', 'A'),
+    ('î', 'i'), ('Î', 'I'),
+    ('ș', 's'), ('Ș', 'S'),
+    ('ț', 't'), ('Ț', 'T'),
+)
+
+
+def remove_diacritics(text):
+    """
+    Remove Romanian diacritics from text.
+    Converts: ă→a, â→a, î→i, ș→s, ț→t (both uppercase and lowercase)
+    """
+    if not text:
+        return text
+    
+    if not isinstance(text, str):
+        text = str(text)
+    
+    # Numbers, SKUs and most labels are plain ASCII and need no pass; they
+    # are returned before the cache so they do not crowd it
+    if text.isascii():
+        return text
+    
+    return _replace_diacritics(text)
+
+
+# Memoized since the same labels and names are converted on every export
+@lru_cache(maxsize=4096)
+def _replace_diacritics(text):
+    """Replace the diacritics in a non-ASCII string."""
+    for diacritic, replacement in DIACRITICS:
+        text = text.replace(diacritic, replacement)
+    
+    return text
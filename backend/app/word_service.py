@@ -1,55 +1,113 @@
 """Word document generation service for commercial offers."""
 
+from copy import deepcopy
 from datetime import datetime, timezone
+from functools import lru_cache
 from io import BytesIO
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.text.font import Font
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 
+from .text_utils import remove_diacritics
+
 
 # Constants
 OFFER_VALIDITY_DAYS = 30
 
+# Text colors (RGBColor is immutable, so one instance serves every run)
+BRAND_BLUE = RGBColor(30, 64, 175)
+WHITE = RGBColor(255, 255, 255)
 
-def remove_diacritics(text):
-    """
-    Remove Romanian diacritics from text.
-    Converts: ă→a, â→a, î→i, ș→s, ț→t (both uppercase and lowercase)
+# Fixed table labels and terms; they are written without diacritics
+MATERIALS_HEADERS = ('Nr.', 'Material', 'SKU', 'Cantitate', 'Pret Unitar cu Adaos (RON)', 'Total (RON)')
+NUMERIC_MATERIAL_COLUMNS = (0, 3, 4, 5)
+ADDITIONAL_COSTS_HEADERS = ('Tip Cost', 'Valoare (RON)')
+OFFER_TERMS = (
+    "• Preturile sunt exprimate in RON si nu includ TVA.",
+    f"• Oferta este valabila {OFFER_VALIDITY_DAYS} de zile de la data emiterii.",
+    "• Timpul de livrare va fi confirmat la plasarea comenzii.",
+    "• Montajul si punerea in functiune sunt incluse in pret.",
+    "• Garantie conform specificatiilor producatorilor.",
+)
+
+
+@lru_cache(maxsize=None)
+def shading_template(color):
+    """<w:shd> element for a fill color, built once and copied per cell."""
+    shading_elm = OxmlElement('w:shd')
+    shading_elm.set(qn('w:fill'), color)
+    return shading_elm
+
+
+def set_cell_background(cell, color):
+    """Set background color for a table cell."""
+    cell._element.get_or_add_tcPr().append(deepcopy(shading_template(color)))
+
+
+@lru_cache(maxsize=None)
+def header_paragraph_template():
+    """Centered paragraph with one bold white run, copied into header cells."""
+    paragraph = OxmlElement('w:p')
+    paragraph.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.CENTER
+    font = Font(paragraph.add_r())
+    font.bold = True
+    font.color.rgb = WHITE
+    return paragraph
+
+
+def fill_header_row(table, headers):
     """
-    if not text:
-        return text
+    Write white bold centered headers on a blue background into the
+    first row of a table.
     
-    if not isinstance(text, str):
-        text = str(text)
+    Each cell gets a copy of the same shading and paragraph templates
+    instead of being styled run by run.
     
-    diacritics_map = {
-        'ă': 'a', 'Ă': 'A',
-        'â': 'a', 'Â': 'A',
-        'î': 'i', 'Î': 'I',
-        'ș': 's', 'Ș': 'S',
-        'ț': 't', 'Ț': 'T'
-    }
-    
-    for diacritic, replacement in diacritics_map.items():
-        text = text.replace(diacritic, replacement)
-    
-    return text
+    Args:
+        table: Table whose first row holds the headers
+        headers: Text of each header cell
+    """
+    for tc, header in zip(table.rows[0]._tr.tc_lst, headers):
+        tc.get_or_add_tcPr().append(deepcopy(shading_template('1e40af')))
+        tc.replace(tc.p_lst[0], deepcopy(header_paragraph_template()))
+        tc.p_lst[0].r_lst[0].text = header
 
 
-def set_cell_background(cell, color):
-    """Set background color for a table cell."""
-    shading_elm = OxmlElement('w:shd')
-    shading_elm.set(qn('w:fill'), color)
-    cell._element.get_or_add_tcPr().append(shading_elm)
+def add_text_row(table, values, right_aligned=()):
+    """
+    Append a row of plain text cells to a table.
+    
+    Produces the same XML as table.add_row() followed by setting each
+    cell's text and alignment, but builds the row directly instead of
+    going through python-docx's row, cell and paragraph objects.
+    
+    Args:
+        table: Table to append to
+        values: Text of each cell
+        right_aligned: Indexes of the cells to align right
+    """
+    tbl = table._tbl
+    tr = OxmlElement('w:tr')
+    for i, (grid_col, value) in enumerate(zip(tbl.tblGrid.gridCol_lst, values)):
+        # A new cell already holds the single empty paragraph to fill
+        tc = tr.add_tc()
+        if grid_col.w is not None:
+            tc.width = grid_col.w
+        paragraph = tc.p_lst[0]
+        if i in right_aligned:
+            paragraph.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.RIGHT
+        paragraph.add_r().text = value
+    tbl.append(tr)
 
 
 def add_heading_with_style(doc, text, level=1):
     """Add a heading with custom styling."""
     heading = doc.add_heading(remove_diacritics(text), level=level)
     for run in heading.runs:
-        run.font.color.rgb = RGBColor(30, 64, 175)  # Blue color
+        run.font.color.rgb = BRAND_BLUE
     return heading
 
 
@@ -78,39 +136,25 @@ def add_materials_table(doc, materials_list):
     table.style = 'Light Grid Accent 1'
     
     # Header row
-    header_cells = table.rows[0].cells
-    headers = ['Nr.', 'Material', 'SKU', 'Cantitate', 'Pret Unitar cu Adaos (RON)', 'Total (RON)']
-    
-    for i, header in enumerate(headers):
-        cell = header_cells[i]
-        cell.text = remove_diacritics(header)
-        set_cell_background(cell, '1e40af')
-        
-        # Make header text white and bold
-        for paragraph in cell.paragraphs:
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            for run in paragraph.runs:
-                run.font.bold = True
-                run.font.color.rgb = RGBColor(255, 255, 255)
+    fill_header_row(table, MATERIALS_HEADERS)
     
-    # Data rows
+    # Data rows; each field is read from the material dict once
     total_cost = 0
     for idx, material in enumerate(materials_list, 1):
-        material_total = material.get('quantity_planned', 0) * material.get('unit_price', 0)
+        quantity = material.get('quantity_planned', 0)
+        unit_price = material.get('unit_price', 0)
+        material_total = quantity * unit_price
         total_cost += material_total
         
-        row = table.add_row()
-        cells = row.cells
-        cells[0].text = str(idx)
-        cells[1].text = remove_diacritics(material.get('material_name', 'N/A'))
-        cells[2].text = remove_diacritics(material.get('material_sku', 'N/A'))
-        cells[3].text = f"{material.get('quantity_planned', 0):.2f}"
-        cells[4].text = f"{material.get('unit_price', 0):.2f}"
-        cells[5].text = f"{material_total:.2f}"
-        
-        # Align numeric columns to the right
-        for i in [0, 3, 4, 5]:
-            cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        # Numeric columns are aligned to the right
+        add_text_row(table, (
+            str(idx),
+            remove_diacritics(material.get('material_name', 'N/A')),
+            remove_diacritics(material.get('material_sku', 'N/A')),
+            f"{quantity:.2f}",
+            f"{unit_price:.2f}",
+            f"{material_total:.2f}",
+        ), right_aligned=NUMERIC_MATERIAL_COLUMNS)
     
     # Add subtotal row
     subtotal_row = table.add_row()
@@ -118,7 +162,7 @@ def add_materials_table(doc, materials_list):
     
     # Merge first 5 cells
     merged_cell = subtotal_cells[0].merge(subtotal_cells[4])
-    merged_cell.text = remove_diacritics('SUBTOTAL MATERIALE (cu adaos):')
+    merged_cell.text = 'SUBTOTAL MATERIALE (cu adaos):'
     merged_cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
     
     subtotal_cells[5].text = f"{total_cost:.2f}"
@@ -140,17 +184,7 @@ def add_additional_costs_table(doc, labor_cost, transport_cost, other_costs):
     table.style = 'Light Grid Accent 1'
     
     # Header row
-    header_cells = table.rows[0].cells
-    header_cells[0].text = remove_diacritics('Tip Cost')
-    header_cells[1].text = remove_diacritics('Valoare (RON)')
-    
-    for cell in header_cells:
-        set_cell_background(cell, '1e40af')
-        for paragraph in cell.paragraphs:
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            for run in paragraph.runs:
-                run.font.bold = True
-                run.font.color.rgb = RGBColor(255, 255, 255)
+    fill_header_row(table, ADDITIONAL_COSTS_HEADERS)
     
     # Cost rows
     costs = [
@@ -160,17 +194,13 @@ def add_additional_costs_table(doc, labor_cost, transport_cost, other_costs):
     ]
     
     for label, value in costs:
-        row = table.add_row()
-        cells = row.cells
-        cells[0].text = remove_diacritics(label)
-        cells[1].text = f"{value:.2f}"
-        cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        add_text_row(table, (label, f"{value:.2f}"), right_aligned=(1,))
     
     # Add subtotal row
     subtotal = labor_cost + transport_cost + other_costs
     subtotal_row = table.add_row()
     cells = subtotal_row.cells
-    cells[0].text = remove_diacritics('SUBTOTAL COSTURI ADITIONALE:')
+    cells[0].text = 'SUBTOTAL COSTURI ADITIONALE:'
     cells[1].text = f"{subtotal:.2f}"
     
     for cell in cells:
@@ -188,7 +218,7 @@ def add_grand_total_table(doc, total_amount):
     table = doc.add_table(rows=1, cols=2)
     
     cells = table.rows[0].cells
-    cells[0].text = remove_diacritics('TOTAL GENERAL:')
+    cells[0].text = 'TOTAL GENERAL:'
     cells[1].text = f"{total_amount:.2f} RON"
     
     for cell in cells:
@@ -198,7 +228,7 @@ def add_grand_total_table(doc, total_amount):
             for run in paragraph.runs:
                 run.font.bold = True
                 run.font.size = Pt(14)
-                run.font.color.rgb = RGBColor(255, 255, 255)
+                run.font.color.rgb = WHITE
     
     return table
 
@@ -232,6 +262,13 @@ def generate_commercial_offer_word(project_data, materials_list=None):
     """
     doc = Document()
     
+    # Read each project field once
+    capacity_kw = project_data.get('capacity_kw')
+    start_date = project_data.get('start_date')
+    estimated_cost = project_data.get('estimated_cost')
+    notes = project_data.get('notes')
+    labor_cost, transport_cost, other_costs = extract_additional_costs(project_data)
+    
     # Set document margins (narrower margins)
     sections = doc.sections
     for section in sections:
@@ -241,10 +278,10 @@ def generate_commercial_offer_word(project_data, materials_list=None):
         section.right_margin = Inches(0.8)
     
     # Title
-    title = doc.add_heading(remove_diacritics('OFERTA COMERCIALA'), 0)
+    title = doc.add_heading('OFERTA COMERCIALA', 0)
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
     for run in title.runs:
-        run.font.color.rgb = RGBColor(30, 64, 175)
+        run.font.color.rgb = BRAND_BLUE
     
     doc.add_paragraph()  # Spacer
     
@@ -279,12 +316,12 @@ def generate_commercial_offer_word(project_data, materials_list=None):
     
     project_info = [
         ('Nume proiect:', project_data.get('name', 'N/A')),
-        ('Capacitate sistem:', f"{project_data.get('capacity_kw', 0)} kW" if project_data.get('capacity_kw') else 'N/A'),
+        ('Capacitate sistem:', f"{capacity_kw} kW" if capacity_kw else 'N/A'),
         ('Status:', project_data.get('status', 'N/A').replace('_', ' ').title())
     ]
     
-    if project_data.get('start_date'):
-        project_info.append(('Data start estimata:', str(project_data.get('start_date'))))
+    if start_date:
+        project_info.append(('Data start estimata:', str(start_date)))
     
     add_two_column_table(doc, project_info)
     doc.add_paragraph()  # Spacer
@@ -297,8 +334,6 @@ def generate_commercial_offer_word(project_data, materials_list=None):
         doc.add_paragraph()  # Spacer
         
         # Additional Costs Section
-        labor_cost, transport_cost, other_costs = extract_additional_costs(project_data)
-        
         add_heading_with_style(doc, 'Costuri Aditionale', level=2)
         
         additional_costs_table, subtotal_additional = add_additional_costs_table(
@@ -313,8 +348,6 @@ def generate_commercial_offer_word(project_data, materials_list=None):
     
     # Pricing section (if no materials provided)
     if not materials_list or len(materials_list) == 0:
-        labor_cost, transport_cost, other_costs = extract_additional_costs(project_data)
-        
         # Show additional costs if any exist
         if labor_cost > 0 or transport_cost > 0 or other_costs > 0:
             add_heading_with_style(doc, 'Costuri Aditionale', level=2)
@@ -322,34 +355,26 @@ def generate_commercial_offer_word(project_data, materials_list=None):
             doc.add_paragraph()  # Spacer
         
         # Show estimated cost if provided
-        if project_data.get('estimated_cost'):
+        if estimated_cost:
             add_heading_with_style(doc, 'Estimare Cost', level=2)
             cost_data = [
-                ('Cost estimat total:', f"{project_data.get('estimated_cost', 0):.2f} RON")
+                ('Cost estimat total:', f"{estimated_cost:.2f} RON")
             ]
             add_two_column_table(doc, cost_data)
             doc.add_paragraph()  # Spacer
     
     # Notes
-    if project_data.get('notes'):
+    if notes:
         add_heading_with_style(doc, 'Note', level=2)
-        doc.add_paragraph(remove_diacritics(project_data.get('notes')))
+        doc.add_paragraph(remove_diacritics(notes))
         doc.add_paragraph()  # Spacer
     
     # Footer with Terms
     doc.add_page_break()
     add_heading_with_style(doc, 'Termeni si Conditii', level=2)
     
-    terms = [
-        "• Preturile sunt exprimate in RON si nu includ TVA.",
-        f"• Oferta este valabila {OFFER_VALIDITY_DAYS} de zile de la data emiterii.",
-        "• Timpul de livrare va fi confirmat la plasarea comenzii.",
-        "• Montajul si punerea in functiune sunt incluse in pret.",
-        "• Garantie conform specificatiilor producatorilor."
-    ]
-    
-    for term in terms:
-        doc.add_paragraph(remove_diacritics(term))
+    for term in OFFER_TERMS:
+        doc.add_paragraph(term)
     
     # Save to BytesIO
     buffer = BytesIO()
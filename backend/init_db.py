@@ -14,12 +14,15 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-from app.database import create_db_and_tables, DATABASE_URL
+# Same default as app.database. Read here so the prompt shows it without
+# importing SQLAlchemy and the models (~0.45s) before the user confirms.
+DATABASE_URL = os.getenv("SOLARAPP_DB_URL", "sqlite:///./data/solarapp.db")
 
 def main():
     """Initialize the database."""
     parser = argparse.ArgumentParser(description='Initialize SolarApp database')
-    parser.add_argument('--non-interactive', action='store_true',
+    parser.add_argument('--non-interactive', '--force', '--no-confirm',
+                        dest='non_interactive', action='store_true',
                         help='Run without prompts (always proceed)')
     args = parser.parse_args()
     
@@ -67,8 +70,11 @@ def main():
     
     try:
         # Create database and tables
-        create_db_and_tables()
-        print("\n✓ Database initialized successfully!")
+        from app.database import create_db_and_tables
+        if create_db_and_tables():
+            print("\n✓ Database initialized successfully!")
+        else:
+            print("\n✓ Schema up to date, nothing to create.")
         print("\nNext steps:")
         print("1. Start the backend server: uvicorn app.main:app --reload")
         print("2. (Optional) Load sample data: python3 sample_data.py")
@@ -3,24 +3,21 @@
 import os
 from datetime import date, datetime
 from dotenv import load_dotenv
-from sqlmodel import Session, create_engine, SQLModel, select
-from app.models import Material, Stock, Project, ProjectMaterial, Purchase, PurchaseItem
+from sqlmodel import Session, select
 
 # Load environment variables
 load_dotenv()
 
-# Get database URL from environment or use default
-DATABASE_URL = os.getenv("SOLARAPP_DB_URL", "sqlite:///./solarapp.db")
+# This script's documented default database; set before app.database
+# reads it, so the app's engine (pool, pre-ping and SQLite pragmas) is
+# reused instead of opening a second one on the same file
+os.environ.setdefault("SOLARAPP_DB_URL", "sqlite:///./solarapp.db")
 
-# Create engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+from app.database import bulk_insert, create_db_and_tables, engine
+from app.models import Material, Stock, Project, ProjectMaterial, Purchase, PurchaseItem, utc_now
 
 # Ensure tables exist
-SQLModel.metadata.create_all(engine)
+create_db_and_tables()
 
 
 def create_sample_data():
@@ -28,198 +25,194 @@ def create_sample_data():
     with Session(engine) as session:
         print("Creating sample materials...")
         
-        # Sample materials
+        # Sample materials, as plain column dicts for bulk_insert
         materials = [
-            Material(
-                name="Solar Panel 450W Monocrystalline",
-                sku="PANEL-450W-MONO",
-                description="High efficiency 450W monocrystalline solar panel",
-                category="panel",
-                unit="buc",
-                unit_price=850.00,
-                min_stock=20
-            ),
-            Material(
-                name="Solar Panel 550W Bifacial",
-                sku="PANEL-550W-BIFA",
-                description="Bifacial 550W solar panel with enhanced performance",
-                category="panel",
-                unit="buc",
-                unit_price=1100.00,
-                min_stock=15
-            ),
-            Material(
-                name="Inverter 5kW Hybrid",
-                sku="INV-5KW-HYB",
-                description="5kW hybrid inverter with battery backup support",
-                category="inverter",
-                unit="buc",
-                unit_price=3500.00,
-                min_stock=5
-            ),
-            Material(
-                name="Inverter 10kW Three Phase",
-                sku="INV-10KW-3PH",
-                description="10kW three phase grid-tie inverter",
-                category="inverter",
-                unit="buc",
-                unit_price=5500.00,
-                min_stock=3
-            ),
-            Material(
-                name="Battery Storage 10kWh LiFePO4",
-                sku="BAT-10KWH-LIFEPO4",
-                description="10kWh LiFePO4 battery storage system",
-                category="battery",
-                unit="buc",
-                unit_price=8000.00,
-                min_stock=5
-            ),
-            Material(
-                name="Battery Storage 15kWh LiFePO4",
-                sku="BAT-15KWH-LIFEPO4",
-                description="15kWh LiFePO4 battery storage system",
-                category="battery",
-                unit="buc",
-                unit_price=11500.00,
-                min_stock=3
-            ),
-            Material(
-                name="Solar Cable 6mm2 Black",
-                sku="CABLE-6MM-BLK",
-                description="6mm2 solar cable, black, UV resistant",
-                category="cable",
-                unit="m",
-                unit_price=12.50,
-                min_stock=500
-            ),
-            Material(
-                name="Solar Cable 4mm2 Red",
-                sku="CABLE-4MM-RED",
-                description="4mm2 solar cable, red, UV resistant",
-                category="cable",
-                unit="m",
-                unit_price=10.00,
-                min_stock=500
-            ),
-            Material(
-                name="Roof Mounting System - Tiled Roof",
-                sku="MOUNT-TILE-KIT",
-                description="Complete mounting system for tiled roofs",
-                category="mounting",
-                unit="set",
-                unit_price=450.00,
-                min_stock=10
-            ),
-            Material(
-                name="Roof Mounting System - Metal Roof",
-                sku="MOUNT-METAL-KIT",
-                description="Complete mounting system for metal roofs",
-                category="mounting",
-                unit="set",
-                unit_price=400.00,
-                min_stock=10
-            ),
-            Material(
-                name="MC4 Connectors Pair",
-                sku="CONN-MC4-PAIR",
-                description="MC4 connector pair (male + female)",
-                category="other",
-                unit="pair",
-                unit_price=8.50,
-                min_stock=100
-            ),
-            Material(
-                name="Junction Box IP65",
-                sku="JBOX-IP65",
-                description="Waterproof junction box IP65 rated",
-                category="other",
-                unit="buc",
-                unit_price=85.00,
-                min_stock=20
-            ),
-            Material(
-                name="AC Protection Box",
-                sku="ACBOX-PROT",
-                description="AC protection box with circuit breakers",
-                category="other",
-                unit="buc",
-                unit_price=250.00,
-                min_stock=15
-            ),
-            Material(
-                name="DC Protection Box",
-                sku="DCBOX-PROT",
-                description="DC protection box with surge protection",
-                category="other",
-                unit="buc",
-                unit_price=180.00,
-                min_stock=15
-            ),
-            Material(
-                name="Grounding Kit",
-                sku="GROUND-KIT",
-                description="Complete grounding kit for solar installation",
-                category="other",
-                unit="set",
-                unit_price=120.00,
-                min_stock=20
-            ),
+            {
+                "name": "Solar Panel 450W Monocrystalline",
+                "sku": "PANEL-450W-MONO",
+                "description": "High efficiency 450W monocrystalline solar panel",
+                "category": "panel",
+                "unit": "buc",
+                "unit_price": 850.00,
+                "min_stock": 20,
+            },
+            {
+                "name": "Solar Panel 550W Bifacial",
+                "sku": "PANEL-550W-BIFA",
+                "description": "Bifacial 550W solar panel with enhanced performance",
+                "category": "panel",
+                "unit": "buc",
+                "unit_price": 1100.00,
+                "min_stock": 15,
+            },
+            {
+                "name": "Inverter 5kW Hybrid",
+                "sku": "INV-5KW-HYB",
+                "description": "5kW hybrid inverter with battery backup support",
+                "category": "inverter",
+                "unit": "buc",
+                "unit_price": 3500.00,
+                "min_stock": 5,
+            },
+            {
+                "name": "Inverter 10kW Three Phase",
+                "sku": "INV-10KW-3PH",
+                "description": "10kW three phase grid-tie inverter",
+                "category": "inverter",
+                "unit": "buc",
+                "unit_price": 5500.00,
+                "min_stock": 3,
+            },
+            {
+                "name": "Battery Storage 10kWh LiFePO4",
+                "sku": "BAT-10KWH-LIFEPO4",
+                "description": "10kWh LiFePO4 battery storage system",
+                "category": "battery",
+                "unit": "buc",
+                "unit_price": 8000.00,
+                "min_stock": 5,
+            },
+            {
+                "name": "Battery Storage 15kWh LiFePO4",
+                "sku": "BAT-15KWH-LIFEPO4",
+                "description": "15kWh LiFePO4 battery storage system",
+                "category": "battery",
+                "unit": "buc",
+                "unit_price": 11500.00,
+                "min_stock": 3,
+            },
+            {
+                "name": "Solar Cable 6mm2 Black",
+                "sku": "CABLE-6MM-BLK",
+                "description": "6mm2 solar cable, black, UV resistant",
+                "category": "cable",
+                "unit": "m",
+                "unit_price": 12.50,
+                "min_stock": 500,
+            },
+            {
+                "name": "Solar Cable 4mm2 Red",
+                "sku": "CABLE-4MM-RED",
+                "description": "4mm2 solar cable, red, UV resistant",
+                "category": "cable",
+                "unit": "m",
+                "unit_price": 10.00,
+                "min_stock": 500,
+            },
+            {
+                "name": "Roof Mounting System - Tiled Roof",
+                "sku": "MOUNT-TILE-KIT",
+                "description": "Complete mounting system for tiled roofs",
+                "category": "mounting",
+                "unit": "set",
+                "unit_price": 450.00,
+                "min_stock": 10,
+            },
+            {
+                "name": "Roof Mounting System - Metal Roof",
+                "sku": "MOUNT-METAL-KIT",
+                "description": "Complete mounting system for metal roofs",
+                "category": "mounting",
+                "unit": "set",
+                "unit_price": 400.00,
+                "min_stock": 10,
+            },
+            {
+                "name": "MC4 Connectors Pair",
+                "sku": "CONN-MC4-PAIR",
+                "description": "MC4 connector pair (male + female)",
+                "category": "other",
+                "unit": "pair",
+                "unit_price": 8.50,
+                "min_stock": 100,
+            },
+            {
+                "name": "Junction Box IP65",
+                "sku": "JBOX-IP65",
+                "description": "Waterproof junction box IP65 rated",
+                "category": "other",
+                "unit": "buc",
+                "unit_price": 85.00,
+                "min_stock": 20,
+            },
+            {
+                "name": "AC Protection Box",
+                "sku": "ACBOX-PROT",
+                "description": "AC protection box with circuit breakers",
+                "category": "other",
+                "unit": "buc",
+                "unit_price": 250.00,
+                "min_stock": 15,
+            },
+            {
+                "name": "DC Protection Box",
+                "sku": "DCBOX-PROT",
+                "description": "DC protection box with surge protection",
+                "category": "other",
+                "unit": "buc",
+                "unit_price": 180.00,
+                "min_stock": 15,
+            },
+            {
+                "name": "Grounding Kit",
+                "sku": "GROUND-KIT",
+                "description": "Complete grounding kit for solar installation",
+                "category": "other",
+                "unit": "set",
+                "unit_price": 120.00,
+                "min_stock": 20,
+            },
         ]
         
-        # Add materials only if they don't already exist (check by SKU)
-        added_materials = []
-        new_materials = []
+        # Add materials only if they don't already exist (check by SKU).
+        # Existing SKUs are looked up in one query and the new materials
+        # are inserted with batched executemany instead of row by row.
+        skus = [material["sku"] for material in materials]
+        existing_skus = set(session.exec(
+            select(Material.sku).where(Material.sku.in_(skus))
+        ).all())
+        
+        now = utc_now()
+        new_material_rows = []
         for material in materials:
-            # Check if material with this SKU already exists
-            existing_material = session.exec(
-                select(Material).where(Material.sku == material.sku)
-            ).first()
-            
-            if existing_material:
-                print(f"  - Material '{material.sku}' already exists, skipping...")
-                # Refresh to ensure we have the latest data from the database
-                session.refresh(existing_material)
-                added_materials.append(existing_material)
+            if material["sku"] in existing_skus:
+                print(f"  - Material '{material['sku']}' already exists, skipping...")
             else:
-                session.add(material)
-                added_materials.append(material)
-                new_materials.append(material)
-                print(f"  - Adding material '{material.sku}'...")
+                new_material_rows.append({**material, "created_at": now, "updated_at": now})
+                print(f"  - Adding material '{material['sku']}'...")
         
-        session.commit()
+        bulk_insert(session, Material, new_material_rows)
         
-        # Refresh newly added materials to get their IDs
-        for material in new_materials:
-            session.refresh(material)
-        
-        # Use added_materials list for subsequent operations
-        materials = added_materials
+        # One query for the IDs of all sample materials, old and new
+        materials = session.exec(
+            select(Material.id, Material.sku, Material.category, Material.min_stock)
+            .where(Material.sku.in_(skus))
+            .order_by(Material.id)
+        ).all()
         
         # Create initial stock for materials
         print("Creating initial stock...")
+        stocked_material_ids = set(session.exec(
+            select(Stock.material_id).where(Stock.material_id.in_([m.id for m in materials]))
+        ).all())
+        
+        stock_rows = []
         for material in materials:
-            
-            # Check if stock already exists for this material
-            existing_stock = session.exec(
-                select(Stock).where(Stock.material_id == material.id)
-            ).first()
-            
-            if existing_stock:
+            if material.id in stocked_material_ids:
                 print(f"  - Stock for material '{material.sku}' already exists, skipping...")
             else:
                 # Set some initial stock quantities
                 initial_qty = material.min_stock * 1.5 if material.category in ["panel", "inverter", "battery"] else material.min_stock * 2
                 
-                stock = Stock(
-                    material_id=material.id,
-                    quantity=initial_qty,
-                    location="Main Warehouse"
-                )
-                session.add(stock)
+                stock_rows.append({
+                    "material_id": material.id,
+                    "quantity": initial_qty,
+                    "location": "Main Warehouse",
+                    "updated_at": now,
+                })
                 print(f"  - Adding stock for material '{material.sku}'...")
         
-        session.commit()
+        bulk_insert(session, Stock, stock_rows)
         
         # Create sample projects
         print("Creating sample projects...")
@@ -274,17 +267,21 @@ def create_sample_data():
         ]
         
         # Add projects only if they don't already exist (check by name)
+        existing_names = set(session.exec(
+            select(Project.name).where(Project.name.in_([project.name for project in projects]))
+        ).all())
+        
+        new_project_rows = []
         for project in projects:
-            existing_project = session.exec(
-                select(Project).where(Project.name == project.name)
-            ).first()
-            
-            if existing_project:
+            if project.name in existing_names:
                 print(f"  - Project '{project.name}' already exists, skipping...")
             else:
-                session.add(project)
+                new_project_rows.append(project.model_dump(exclude={"id"}))
                 print(f"  - Adding project '{project.name}'...")
         
+        bulk_insert(session, Project, new_project_rows)
+        
+        # Everything above ran in the session's single transaction
         session.commit()
         
         print("Sample data created successfully!")
@@ -1,17 +1,42 @@
 """XML Invoice Parser Service for UBL/e-Factura format."""
 
 import os
+import hashlib
+import hmac
 import logging
+from collections import OrderedDict
+from copy import deepcopy
+import orjson
 from flask import Flask, request, jsonify
-from defusedxml import ElementTree as ET
+from flask.json.provider import JSONProvider
+from lxml import etree
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider encoding and decoding with orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # orjson already produces UTF-8 bytes; skip the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
 app = Flask(__name__)
+# jsonify() goes through orjson, so large invoices encode in C
+app.json = ORJSONProvider(app)
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 API_TOKEN = os.getenv('XML_PARSER_TOKEN', 'dev-token-12345')
+_API_TOKEN_BYTES = API_TOKEN.encode()
 
 # Security warning for default token
 if API_TOKEN == 'dev-token-12345':
@@ -27,124 +52,228 @@ NAMESPACES = {
     'invoice': 'urn:oasis:names:specification:ubl:schema:xsd:Invoice-2'
 }
 
+# libxml2 parser options for untrusted uploads: entities are never
+# expanded (no XXE), nothing is fetched over the network and the default
+# size and entity amplification limits stay on (no billion laughs).
+# Documents with a DTD are rejected outright; e-Factura invoices never
+# carry one.
+_HARDENED_PARSING = {
+    'resolve_entities': False,
+    'no_network': True,
+    'huge_tree': False,
+}
+
+# Clark-notation ({namespace}name) tags read from invoices
+_CAC = '{%s}' % NAMESPACES['cac']
+_CBC = '{%s}' % NAMESPACES['cbc']
+
+_INVOICE_FIELDS = {
+    _CBC + 'ID': 'invoice_number',
+    _CBC + 'IssueDate': 'invoice_date',
+    _CBC + 'DocumentCurrencyCode': 'currency',
+}
+_AMOUNT_FIELDS = {
+    _CAC + 'LegalMonetaryTotal': ('total_amount', _CBC + 'PayableAmount'),
+    _CAC + 'TaxTotal': ('tax_amount', _CBC + 'TaxAmount'),
+}
+
+_PARTY = _CAC + 'Party'
+_PARTY_ROLES = {
+    _CAC + 'AccountingSupplierParty': 'supplier',
+    _CAC + 'AccountingCustomerParty': 'customer',
+}
+
+# Fields read from a party / invoice line subtree: element tag ->
+# (field name, required parent tag, required grandparent tag), where
+# None accepts any ancestor, like the './/' paths these stand for
+_PARTY_FIELDS = {
+    _CBC + 'Name': ('name', _CAC + 'PartyName', None),
+    _CBC + 'CompanyID': ('tax_id', _CAC + 'PartyTaxScheme', None),
+}
+
+_INVOICE_LINE = _CAC + 'InvoiceLine'
+_LINE_FIELDS = {
+    _CBC + 'Name': ('description', _CAC + 'Item', None),
+    _CBC + 'ID': ('sku', _CAC + 'SellersItemIdentification', _CAC + 'Item'),
+    _CBC + 'InvoicedQuantity': ('quantity', None, None),
+    _CBC + 'PriceAmount': ('unit_price', _CAC + 'Price', None),
+    _CBC + 'LineExtensionAmount': ('total_price', None, None),
+}
+
+# Only these elements are handed back by iterparse; libxml2 skips the rest
+_STREAMED_TAGS = [*_INVOICE_FIELDS, *_AMOUNT_FIELDS, *_PARTY_ROLES, _INVOICE_LINE]
+
+# Accepted upload suffixes (compared case-insensitively)
+_XML_EXT = ('.xml',)
+
+# In-process LRU cache of parsed invoices keyed by file content hash, so
+# retried or repeated uploads of the same file are not parsed again
+PARSE_CACHE_SIZE = 256
+_parse_cache = OrderedDict()
+
+# Chunk size used when hashing uploads (1 MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 
 def check_auth():
     """Check API token authentication."""
-    token = request.headers.get('X-API-Token')
-    if API_TOKEN and token != API_TOKEN:
-        return False
-    return True
+    if not API_TOKEN:
+        return True
+    token = request.headers.get('X-API-Token', '')
+    # Constant-time comparison, so response timing does not leak the token
+    return hmac.compare_digest(token.encode(), _API_TOKEN_BYTES)
+
+
+def find_fields(elem, fields):
+    """
+    Return the text of the first element matching each field of a subtree.
+    
+    The subtree is walked once, with libxml2 only yielding the tags listed
+    in fields, instead of one find() per field.
+    
+    Args:
+        elem: Root of the subtree
+        fields: Mapping of tag to (field name, parent tag, grandparent tag)
+    
+    Returns:
+        dict: field name -> element text, for the fields that were found
+    """
+    values = {}
+    for child in elem.iter(*fields):
+        name, parent_tag, grandparent_tag = fields[child.tag]
+        if name in values:
+            continue
+        if parent_tag is not None:
+            parent = child.getparent()
+            if parent.tag != parent_tag:
+                continue
+            if grandparent_tag is not None:
+                grandparent = parent.getparent()
+                if grandparent is None or grandparent.tag != grandparent_tag:
+                    continue
+        values[name] = child.text or ''
+        if len(values) == len(fields):
+            break
+    return values
+
+
+def parse_amount(text):
+    """Convert a quantity or amount to float; missing or empty values are 0.0."""
+    return float(text) if text else 0.0
+
+
+def parse_party(party, prefix, invoice_data):
+    """Copy the name and tax ID of a supplier or customer cac:Party."""
+    for name, text in find_fields(party, _PARTY_FIELDS).items():
+        invoice_data[f'{prefix}_{name}'] = text
+
+
+def parse_invoice_line(item):
+    """Build the line item dict of a cac:InvoiceLine element."""
+    values = find_fields(item, _LINE_FIELDS)
+    return {
+        'description': values.get('description', ''),
+        'quantity': parse_amount(values.get('quantity')),
+        'unit_price': parse_amount(values.get('unit_price')),
+        'total_price': parse_amount(values.get('total_price')),
+        'sku': values.get('sku', '')
+    }
+
+
+def parse_cached(stream):
+    """
+    Parse an invoice XML stream, reusing the result for identical content.
+    
+    The stream is hashed in chunks, rewound and parsed in place, so an
+    upload Werkzeug spooled to a temporary file is never read into memory
+    as a whole. Returns a copy of the cached result, so callers may modify
+    it freely.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+    key = digest.digest()
+    
+    invoice_data = _parse_cache.get(key)
+    if invoice_data is not None:
+        _parse_cache.move_to_end(key)
+    else:
+        stream.seek(0)
+        invoice_data = parse_ubl_invoice(stream)
+        _parse_cache[key] = invoice_data
+        if len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return deepcopy(invoice_data)
 
 
 def parse_ubl_invoice(xml_file):
-    """Parse UBL format invoice XML."""
-    try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        
-        # Extract invoice data
-        invoice_data = {
-            'invoice_number': '',
-            'invoice_date': '',
-            'supplier_name': '',
-            'supplier_tax_id': '',
-            'customer_name': '',
-            'customer_tax_id': '',
-            'currency': 'RON',
-            'total_amount': 0.0,
-            'tax_amount': 0.0,
-            'items': []
-        }
-        
-        # Invoice number
-        invoice_num = root.find('.//cbc:ID', NAMESPACES)
-        if invoice_num is not None:
-            invoice_data['invoice_number'] = invoice_num.text
-        
-        # Invoice date
-        invoice_date = root.find('.//cbc:IssueDate', NAMESPACES)
-        if invoice_date is not None:
-            invoice_data['invoice_date'] = invoice_date.text
-        
-        # Supplier info
-        supplier_party = root.find('.//cac:AccountingSupplierParty/cac:Party', NAMESPACES)
-        if supplier_party is not None:
-            supplier_name = supplier_party.find('.//cac:PartyName/cbc:Name', NAMESPACES)
-            if supplier_name is not None:
-                invoice_data['supplier_name'] = supplier_name.text
-            
-            supplier_tax = supplier_party.find('.//cac:PartyTaxScheme/cbc:CompanyID', NAMESPACES)
-            if supplier_tax is not None:
-                invoice_data['supplier_tax_id'] = supplier_tax.text
-        
-        # Customer info
-        customer_party = root.find('.//cac:AccountingCustomerParty/cac:Party', NAMESPACES)
-        if customer_party is not None:
-            customer_name = customer_party.find('.//cac:PartyName/cbc:Name', NAMESPACES)
-            if customer_name is not None:
-                invoice_data['customer_name'] = customer_name.text
-            
-            customer_tax = customer_party.find('.//cac:PartyTaxScheme/cbc:CompanyID', NAMESPACES)
-            if customer_tax is not None:
-                invoice_data['customer_tax_id'] = customer_tax.text
-        
-        # Currency
-        currency_code = root.find('.//cbc:DocumentCurrencyCode', NAMESPACES)
-        if currency_code is not None:
-            invoice_data['currency'] = currency_code.text
-        
-        # Total amount
-        total_amount = root.find('.//cac:LegalMonetaryTotal/cbc:PayableAmount', NAMESPACES)
-        if total_amount is not None:
-            invoice_data['total_amount'] = float(total_amount.text)
+    """
+    Parse UBL format invoice XML.
+    
+    The document is read in one streaming pass. Parties and invoice lines
+    are handled as soon as their closing tag is parsed and then cleared,
+    so a large invoice is never held in memory as a full tree. Each value
+    still comes from the first matching element in document order.
+    
+    Raises:
+        etree.XMLSyntaxError: If the document is not well-formed XML
+        ValueError: If the document has a DTD or an amount or quantity
+            is not a number
+    """
+    # Extract invoice data
+    invoice_data = {
+        'invoice_number': '',
+        'invoice_date': '',
+        'supplier_name': '',
+        'supplier_tax_id': '',
+        'customer_name': '',
+        'customer_tax_id': '',
+        'currency': 'RON',
+        'total_amount': 0.0,
+        'tax_amount': 0.0,
+        'items': []
+    }
+    found = set()
+    
+    context = etree.iterparse(xml_file, tag=_STREAMED_TAGS, **_HARDENED_PARSING)
+    for _, elem in context:
+        tag = elem.tag
         
-        # Tax amount
-        tax_amount = root.find('.//cac:TaxTotal/cbc:TaxAmount', NAMESPACES)
-        if tax_amount is not None:
-            invoice_data['tax_amount'] = float(tax_amount.text)
+        # Invoice number, date and currency
+        key = _INVOICE_FIELDS.get(tag)
+        if key is not None:
+            if key not in found:
+                found.add(key)
+                invoice_data[key] = elem.text or ''
         
         # Line items
-        items = root.findall('.//cac:InvoiceLine', NAMESPACES)
-        for item in items:
-            line_item = {
-                'description': '',
-                'quantity': 0.0,
-                'unit_price': 0.0,
-                'total_price': 0.0,
-                'sku': ''
-            }
-            
-            # Item description
-            item_name = item.find('.//cac:Item/cbc:Name', NAMESPACES)
-            if item_name is not None:
-                line_item['description'] = item_name.text
-            
-            # SKU / Seller Item ID
-            seller_id = item.find('.//cac:Item/cac:SellersItemIdentification/cbc:ID', NAMESPACES)
-            if seller_id is not None:
-                line_item['sku'] = seller_id.text
-            
-            # Quantity
-            quantity = item.find('.//cbc:InvoicedQuantity', NAMESPACES)
-            if quantity is not None:
-                line_item['quantity'] = float(quantity.text)
-            
-            # Unit price
-            unit_price = item.find('.//cac:Price/cbc:PriceAmount', NAMESPACES)
-            if unit_price is not None:
-                line_item['unit_price'] = float(unit_price.text)
-            
-            # Line total
-            line_total = item.find('.//cbc:LineExtensionAmount', NAMESPACES)
-            if line_total is not None:
-                line_item['total_price'] = float(line_total.text)
-            
-            invoice_data['items'].append(line_item)
+        elif tag == _INVOICE_LINE:
+            invoice_data['items'].append(parse_invoice_line(elem))
+            elem.clear()
+        
+        # Supplier and customer info
+        elif tag in _PARTY_ROLES:
+            prefix = _PARTY_ROLES[tag]
+            party = elem.find(_PARTY)
+            if party is not None and prefix not in found:
+                found.add(prefix)
+                parse_party(party, prefix, invoice_data)
+            elem.clear()
         
-        return invoice_data
+        # Total and tax amounts
+        elif tag in _AMOUNT_FIELDS:
+            key, child_tag = _AMOUNT_FIELDS[tag]
+            amount = elem.find(child_tag)
+            if amount is not None and key not in found:
+                found.add(key)
+                invoice_data[key] = parse_amount(amount.text)
     
-    except Exception as e:
-        raise Exception(f"Error parsing XML: {str(e)}")
+    # Entities are left unexpanded, so a DTD could only blank out fields
+    docinfo = context.root.getroottree().docinfo
+    if docinfo.doctype or docinfo.internalDTD is not None:
+        raise ValueError('DTDs are not allowed in invoices')
+    
+    return invoice_data
 
 
 @app.route('/health', methods=['GET'])
@@ -169,17 +298,23 @@ def parse_invoice():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    if not file.filename.endswith('.xml'):
+    if not file.filename.lower().endswith(_XML_EXT):
         return jsonify({'error': 'Only XML files are allowed'}), 400
     
     try:
         # Parse the invoice
-        invoice_data = parse_ubl_invoice(file)
+        invoice_data = parse_cached(file.stream)
         
         return jsonify(invoice_data), 200
     
+    except etree.XMLSyntaxError as e:
+        return jsonify({'error': f'Malformed XML: {e}'}), 400
+    
+    except ValueError as e:
+        return jsonify({'error': f'Invalid invoice: {e}'}), 422
+    
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': f'Error parsing XML: {e}'}), 500
 
 
 @app.route('/', methods=['GET'])
@@ -196,5 +331,6 @@ def index():
 
 
 if __name__ == '__main__':
+    # Development server only; deployments run the app under gunicorn
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
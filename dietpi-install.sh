@@ -392,6 +392,7 @@ Type=simple
 User=$CURRENT_USER
 WorkingDirectory=$INSTALL_DIR/backend
 Environment="PATH=$INSTALL_DIR/backend/.venv/bin"
+Environment="XML_PARSER_URL=http://localhost:$XML_PARSER_PORT"
 # Optimized for Raspberry Pi with single worker
 ExecStart=$INSTALL_DIR/backend/.venv/bin/uvicorn app.main:app --host 0.0.0.0 --port $BACKEND_PORT --workers 1 --limit-concurrency 50 --timeout-keep-alive 5
 Restart=always
@@ -420,7 +421,7 @@ Type=simple
 User=$CURRENT_USER
 WorkingDirectory=$INSTALL_DIR/backend/services/xml_parser
 Environment="PATH=$INSTALL_DIR/backend/services/xml_parser/.venv/bin"
-ExecStart=$INSTALL_DIR/backend/services/xml_parser/.venv/bin/python parser_app.py
+ExecStart=$INSTALL_DIR/backend/services/xml_parser/.venv/bin/gunicorn --bind 0.0.0.0:$XML_PARSER_PORT --workers 2 parser_app:app
 Restart=always
 RestartSec=5
 
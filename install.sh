@@ -320,7 +320,7 @@ Type=simple
 User=$SERVICE_USER
 WorkingDirectory=$INSTALL_DIR/backend/services/xml_parser
 Environment="PATH=$INSTALL_DIR/backend/services/xml_parser/.venv/bin"
-ExecStart=$INSTALL_DIR/backend/services/xml_parser/.venv/bin/python parser_app.py
+ExecStart=$INSTALL_DIR/backend/services/xml_parser/.venv/bin/gunicorn --bind 0.0.0.0:5000 --workers 2 parser_app:app
 Restart=always
 
 [Install]
@@ -40,4 +40,22 @@ while IFS= read -r file; do
   fi
 done <<< "$staged_files"
 
+# 3) Each API module must define its router exactly once. Pasting a second
+#    copy of a module into the same file silently replaces the first router.
+duplicate_found=0
+while IFS= read -r file; do
+  [[ -z "$file" ]] && continue
+  [[ "$file" != backend/app/api/*.py ]] && continue
+
+  router_count="$(git show ":$file" | grep -c '^router = APIRouter' || true)"
+  if [[ "$router_count" -gt 1 ]]; then
+    duplicate_found=1
+    echo "ERROR: $file defines its router $router_count times; keep a single copy of the module."
+  fi
+done <<< "$staged_files"
+
+if [[ "$duplicate_found" -eq 1 ]]; then
+  exit 1
+fi
+
 echo "Pre-commit safety checks passed."